@@ -0,0 +1,62 @@
+"""
+bootstrap.py
+
+Bootstrap confidence intervals for the relative sentiment of each candidate.
+
+Resampling a candidate's posts with replacement only changes how many times each
+distinct sentiment value is drawn, so instead of drawing every post of every
+resample, the number of draws of each distinct value is taken from a multinomial
+distribution. This gives the same distribution of resampled sums as the plain
+bootstrap at a cost that depends on the number of distinct values rather than
+on the number of posts.
+"""
+import numpy as np
+
+RESAMPLES = 2000
+CONFIDENCE = 0.95
+
+
+def resampled_sums(values, resamples=RESAMPLES, random=None):
+    """
+    Return the sums of the given values over bootstrap resamples
+
+    :param values:      array of the sentiment values of one candidate's posts
+    :param resamples:   the number of bootstrap resamples
+    :param random:      numpy RandomState to draw with
+    :return:            array of one resampled sum per resample
+    """
+    if random is None:
+        random = np.random.RandomState()
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.zeros(resamples)
+    distinct, counts = np.unique(values, return_counts=True)
+    draws = random.multinomial(len(values), counts / len(values), size=resamples)
+    return draws.dot(distinct)
+
+
+def confidence_intervals(values, resamples=RESAMPLES, confidence=CONFIDENCE, seed=None):
+    """
+    Return bootstrap confidence intervals of the relative sentiment of each candidate, as
+    computed by polldit.relative_sentiments, over resamples of every candidate's posts
+
+    :param values:      dictionary of candidates mapped to arrays of the sentiment values of their posts
+    :param resamples:   the number of bootstrap resamples
+    :param confidence:  the confidence level of the intervals
+    :param seed:        optional seed for reproducible intervals
+    :return:            dictionary of candidates mapped to (low, high) tuples
+    """
+    candidates = [candidate for candidate in values if len(values[candidate]) > 0]
+    if not candidates:
+        return dict()
+    random = np.random.RandomState(seed)
+    overall_total = sum(len(values[candidate]) for candidate in candidates)
+
+    # one row of resampled averages per candidate, normalized to the lowest candidate of each resample
+    averages = np.vstack([resampled_sums(values[candidate], resamples, random) for candidate in candidates])
+    averages /= overall_total
+    averages -= np.minimum(averages.min(axis=0), 0)
+
+    alpha = (1 - confidence) / 2
+    lows, highs = np.percentile(averages, [100 * alpha, 100 * (1 - alpha)], axis=1)
+    return dict((candidate, (float(low), float(high))) for candidate, low, high in zip(candidates, lows, highs))
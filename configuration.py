@@ -5,7 +5,6 @@ Nick Flanders
 Loads configuration data from the config.yaml into a Python format
 """
 import yaml
-import utils
 import praw
 
 
@@ -18,6 +17,27 @@ with open(CONFIG_FILE, 'r') as f:
 
 DB = config["db"]
 
+# settings of the pooled read-only connections to the database
+DB_POOL = dict(
+    size=config.get("db_pool_size", 4),
+    cacheSize=config.get("db_cache_size", -65536),
+    mmapSize=config.get("db_mmap_size", 268435456),
+    tempStore=config.get("db_temp_store", "memory"))
+
+# write one database file per 'year', 'month' or 'day' when crawling; db is then a directory of them
+PARTITION_BY = config.get("partition_by")
+
+# store comment and post bodies compressed when crawling
+COMPRESS_TEXT = config.get("compress_text", False)
+
+# on-disk cache of reddit API responses used when crawling, None to always request
+RESPONSE_CACHE = config.get("response_cache")
+RESPONSE_CACHE_TTL = config.get("response_cache_ttl", 3600)
+RESPONSE_CACHE_RECENT_DAYS = config.get("response_cache_recent_days", 7)
+
+# optional packed corpus file to train on instead of the reddit_politics NLTK corpus
+CORPUS = config.get("corpus")
+
 
 USER_AGENT = config['user_agent']
 REDDIT = praw.Reddit(USER_AGENT)
@@ -42,4 +62,8 @@ ALL_NAMES = []
 for candidate in CANDIDATES:
     ALL_NAMES += CANDIDATES[candidate]
 
-FILTER_LIST = config["filter_list"]
\ No newline at end of file
+FILTER_LIST = config["filter_list"]
+FILTER_SET = frozenset(FILTER_LIST)
+
+# optional number of buckets to hash words into instead of using every word as a feature
+FEATURE_BUCKETS = config.get("feature_buckets")
\ No newline at end of file
@@ -13,14 +13,23 @@ import collections
 import nltk
 import nltk.classify.util
 from nltk.classify import NaiveBayesClassifier
-from nltk.corpus import reddit_politics
 from nltk.corpus import movie_reviews
 import random
+import pickle
 import pygal
-from configuration import FILTER_LIST
+import utils
+import packed_corpus
+from configuration import CORPUS
+
+if CORPUS is not None:
+    reddit_politics = packed_corpus.PackedCorpusReader(CORPUS)
+else:
+    from nltk.corpus import reddit_politics
 
 ITERATIONS = 100
 OUTPUT = "corpora_comparison.svg"
+# feature bucket sizes to report the accuracy and model size of instead of comparing corpora
+BUCKET_SIZES = None
 
 # process command line inputs
 try:
@@ -32,8 +41,10 @@ try:
                 OUTPUT = sys.argv[index + 1]
                 if OUTPUT[-4:] != ".svg":
                     OUTPUT += ".svg"
+            elif flag == "-b":
+                BUCKET_SIZES = [None if size == "none" else int(size) for size in sys.argv[index + 1].split(",")]
 except:
-    print("Syntax:  python corpus_compare.py [-i number_of_iterations] [-o output_svg]")
+    print("Syntax:  python corpus_compare.py [-i number_of_iterations] [-o output_svg] [-b bucket_sizes]")
 
 
 
@@ -44,8 +55,33 @@ warnings.filterwarnings("ignore")
 
 
 
-def word_feats(words, filter_list):
-    return dict([(word, True) for word in words if word not in filter_list and len(word) > 2])
+def bucket_report(bucket_sizes, iterations):
+    """
+    Print the mean accuracy and the size of Reddit corpus classifiers trained with each
+    number of feature buckets, where a size of None uses every word as its own feature
+    """
+    neg_words = [list(reddit_politics.words(fileids=[f])) for f in reddit_politics.fileids('neg')]
+    pos_words = [list(reddit_politics.words(fileids=[f])) for f in reddit_politics.fileids('pos')]
+    print("{0: <10} {1: <10} {2: <10} {3: <12}".format("buckets", "accuracy", "features", "model bytes"))
+    for buckets in bucket_sizes:
+        negfeats = [(utils.word_feats(words, buckets=buckets), 'neg') for words in neg_words]
+        posfeats = [(utils.word_feats(words, buckets=buckets), 'pos') for words in pos_words]
+        total_accuracy = 0
+        for _ in range(iterations):
+            random.shuffle(negfeats)
+            random.shuffle(posfeats)
+            negcutoff = int(len(negfeats) * 3 / 4)
+            poscutoff = int(len(posfeats) * 3 / 4)
+            classifier = NaiveBayesClassifier.train(negfeats[:negcutoff] + posfeats[:poscutoff])
+            total_accuracy += nltk.classify.util.accuracy(classifier, negfeats[negcutoff:] + posfeats[poscutoff:])
+        features = len(set(name for feats, _ in negfeats + posfeats for name in feats))
+        print("{0: <10} {1: <10.4f} {2: <10} {3: <12}".format(
+            str(buckets), total_accuracy / iterations, features, len(pickle.dumps(classifier))))
+
+
+if BUCKET_SIZES is not None:
+    bucket_report(BUCKET_SIZES, ITERATIONS)
+    sys.exit(0)
 
 
 
@@ -56,10 +92,10 @@ movie_negids = movie_reviews.fileids('neg')
 movie_posids = movie_reviews.fileids('pos')
  
 # process the positive and negative features of each corpus
-reddit_negfeats = [(word_feats(reddit_politics.words(fileids=[f]), FILTER_LIST), 'neg') for f in reddit_negids]
-reddit_posfeats = [(word_feats(reddit_politics.words(fileids=[f]), FILTER_LIST), 'pos') for f in reddit_posids]
-movie_negfeats = [(word_feats(movie_reviews.words(fileids=[f]), FILTER_LIST), 'neg') for f in movie_negids]
-movie_posfeats = [(word_feats(movie_reviews.words(fileids=[f]), FILTER_LIST), 'pos') for f in movie_posids]
+reddit_negfeats = [(utils.word_feats(reddit_politics.words(fileids=[f])), 'neg') for f in reddit_negids]
+reddit_posfeats = [(utils.word_feats(reddit_politics.words(fileids=[f])), 'pos') for f in reddit_posids]
+movie_negfeats = [(utils.word_feats(movie_reviews.words(fileids=[f])), 'neg') for f in movie_negids]
+movie_posfeats = [(utils.word_feats(movie_reviews.words(fileids=[f])), 'pos') for f in movie_posids]
 
 # list of tuples containing the accuracies of each training corpus
 accuracies = []
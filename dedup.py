@@ -0,0 +1,151 @@
+"""
+dedup.py
+
+Near-duplicate detection for Reddit content using MinHash signatures and
+locality-sensitive hashing, so that reposted headlines, crossposts and
+copy-pasted comments can be classified once per group instead of once per copy.
+
+Usage (report how much of a database is near-duplicated):
+
+    python dedup.py <path to SQLite DB> [similarity threshold]
+
+"""
+import re
+import sys
+import time
+import zlib
+import numpy as np
+
+# prime modulus of the MinHash permutations, small enough that a * x + b fits in 64 bits
+PRIME = (1 << 31) - 1
+
+# lowest probability that a pair of texts exactly at the threshold is compared by LSH
+RECALL = 0.95
+
+
+def lsh_shape(threshold, num_perm, recall=RECALL):
+    """
+    Return the number of bands and of rows per band for LSH over signatures of num_perm values,
+    so that a pair of texts with the given Jaccard similarity shares at least one band with at
+    least the given probability, while as few less similar pairs as possible are compared
+
+    A pair with similarity s shares a band with probability 1 - (1 - s ** rows) ** bands, so more
+    rows per band compare fewer dissimilar pairs and fewer rows find more similar ones.
+    """
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of texts and groups texts whose estimated Jaccard
+    similarity of word shingles is at least the given threshold
+    """
+
+    def __init__(self, num_perm=128, bands=None, shingle_size=3, threshold=0.8, seed=1):
+        """
+        :param num_perm:        number of hash permutations in each signature
+        :param bands:           number of LSH bands the signature is split into, which must divide
+                                num_perm, or None to choose the bands from the threshold
+        :param shingle_size:    number of consecutive words in each shingle
+        :param threshold:       estimated Jaccard similarity at which two texts are grouped
+        :param seed:            seed of the random permutations
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be greater than 0 and at most 1")
+        if bands is None:
+            bands, rows = lsh_shape(threshold, num_perm)
+        elif num_perm % bands != 0:
+            raise ValueError("bands must divide num_perm")
+        else:
+            rows = num_perm // bands
+        random = np.random.RandomState(seed)
+        self.a = random.randint(1, PRIME, size=num_perm).astype(np.uint64)
+        self.b = random.randint(0, PRIME, size=num_perm).astype(np.uint64)
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+    def shingles(self, text):
+        """
+        Return the set of word shingles of the given text, ignoring case and punctuation
+        """
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.shingle_size:
+            return set([" ".join(words)])
+        return set(" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1))
+
+    def signature(self, text):
+        """
+        Return the MinHash signature of the given text as an array of num_perm values
+        """
+        hashes = np.array([zlib.crc32(shingle.encode("utf-8")) % PRIME for shingle in self.shingles(text)],
+                          dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % PRIME).min(axis=0)
+
+    def group(self, texts):
+        """
+        Group near-identical texts
+
+        :param texts:   list of texts
+        :return:        list holding, for every text, the index of the first text of its group
+        """
+        parents = list(range(len(texts)))
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        signatures = [self.signature(text) for text in texts]
+        buckets = dict()
+        for index, signature in enumerate(signatures):
+            for band in range(self.bands):
+                key = (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                if key not in buckets:
+                    buckets[key] = index
+                    continue
+                # confirm the LSH candidate pair with the full signature before grouping
+                other = buckets[key]
+                root, other_root = find(index), find(other)
+                if root != other_root and np.mean(signature == signatures[other]) >= self.threshold:
+                    parents[max(root, other_root)] = min(root, other_root)
+        return [find(index) for index in range(len(texts))]
+
+
+def group_texts(texts, threshold=0.8):
+    """
+    Return, for every text, the index of the first near-identical text in the list
+    """
+    return MinHasher(threshold=threshold).group(texts)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3]:
+        print("syntax:   python dedup.py <path to SQLite DB> [similarity threshold]")
+        sys.exit(1)
+    from reddit_dataset import dbPool
+    from reddit_dataset import textCompression
+
+    threshold = float(sys.argv[2]) if len(sys.argv) == 3 else 0.8
+    with dbPool.getPool(sys.argv[1]).connection() as connection:
+        dictionaries = textCompression.loadDictionaries(connection)
+        texts = [textCompression.decompressText(body, dictionaries)
+                 for body, in connection.execute("SELECT body FROM comments") if body]
+        texts += [(title or "") + "\n" + (textCompression.decompressText(body, dictionaries) or "")
+                  for title, body in connection.execute("SELECT postTitle, postBody FROM submissions")]
+
+    start = time.time()
+    groups = group_texts(texts, threshold)
+    elapsed = time.time() - start
+
+    distinct = len(set(groups))
+    print("Texts:           ", len(texts))
+    print("Groups:          ", distinct)
+    print("Dedup ratio:     ", "{:.3f}".format(len(texts) / max(distinct, 1)))
+    print("Grouping time:   ", "{:.2f}s".format(elapsed))
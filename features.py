@@ -0,0 +1,26 @@
+"""
+features.py
+
+Word features for the NLTK sentiment classifier, shared by polldit.py and the
+labeling sessions of nltk_corpus_creator.py so that both use the same feature
+space. This module only depends on the standard library, so scripts can use it
+without loading the configuration.
+"""
+import zlib
+
+
+def word_feats(words, filter_list=frozenset(), buckets=None, min_length=3):
+    """
+    Return the feature dictionary of the given words for use with an NLTK classifier
+
+    :param words:       the words of a piece of text
+    :param filter_list: set of words to leave out of the features
+    :param buckets:     the number of buckets to hash words into, or None to use each word as its own feature
+    :param min_length:  the length of the shortest words to use as features
+    :return:            dictionary mapping each word, or the bucket it hashes to, to True
+    """
+    if buckets is None:
+        return dict([(word, True) for word in words if word not in filter_list and len(word) >= min_length])
+    # crc32 is stable across processes, unlike hash(), so hashed models stay valid when reused
+    return dict([(zlib.crc32(word.encode("utf-8")) % buckets, True)
+                 for word in words if word not in filter_list and len(word) >= min_length])
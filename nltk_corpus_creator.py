@@ -10,22 +10,44 @@ Usage:
 
     python nltk_corpus_creator.py <path to SQLite DB> <output directory for corpus>
 
+    python nltk_corpus_creator.py <path to SQLite DB> <output directory for corpus> --session
+
+If the output path ends in .db, labeled items are added to a packed corpus file
+(see packed_corpus.py) instead of being written as individual text files.
+
+With --session, a window of unlabeled rows is fetched and scored by a classifier
+trained on the corpus so far, and the rows it is least certain about are labeled
+first from a priority queue. The classifier is retrained and the window rescored
+and topped up every few labels. Rows labeled in an earlier session are skipped,
+the window and the position in the table are kept between sessions, and the
+corpus indexes continue from the existing files. Enter 'q' to end the session.
+
 """
 
 import sys
 import os
+import re
 import errno
+import heapq
 import sqlite3
+import yaml
+import features
+import packed_corpus
+from reddit_dataset import dbPool
+from reddit_dataset import textCompression
 
 # process command line inputs
-if len(sys.argv) != 3:
-    print("syntax:   python nltk_corpus_creator.py <path to SQLite DB> <output directory for corpus>")
+SESSION = "--session" in sys.argv
+args = [arg for arg in sys.argv[1:] if arg != "--session"]
+if len(args) != 2:
+    print("syntax:   python nltk_corpus_creator.py <path to SQLite DB> <output directory for corpus> [--session]")
     sys.exit(1)
 
-database = str(sys.argv[1])
-corpus_dir = str(sys.argv[2])
+database = str(args[0])
+corpus_dir = str(args[1])
 pos_dir = corpus_dir + "/pos"
 neg_dir = corpus_dir + "/neg"
+packed = corpus_dir.endswith(".db")
 
 # list used to strip names from text before adding to the corpus to avoid associations
 candidates = ['bernie','sanders','bern','hillary','clinton',
@@ -37,6 +59,16 @@ candidates = ['bernie','sanders','bern','hillary','clinton',
 # index of the column in the database to get text content from
 column_index = 1
 
+# number of unlabeled rows kept scored in the priority queue in session mode
+PREFETCH_SIZE = 5000
+# number of rows labeled in session mode before the classifier is retrained and the queue rescored
+RETRAIN_EVERY = 20
+# highest number of parameters of a query, below the SQLite limit
+MAX_PARAMETERS = 500
+
+# table and text column labeled in each mode
+SOURCES = {"submissions": ("submissions", "postTitle"), "comments": ("comments", "body")}
+
 def mkdir_p(path):
     """
     Recursively create new directories (similar functionality to mkdir -p)
@@ -56,12 +88,15 @@ def clear():
 
 
 # create all of the paths needed for this corpus
-if not os.path.exists(corpus_dir):
-    mkdir_p(corpus_dir)
-if not os.path.exists(pos_dir):
-    os.mkdir(pos_dir)
-if not os.path.exists(neg_dir):
-    os.mkdir(neg_dir)
+if packed:
+    corpus_db = packed_corpus.connect(corpus_dir)
+else:
+    if not os.path.exists(corpus_dir):
+        mkdir_p(corpus_dir)
+    if not os.path.exists(pos_dir):
+        os.mkdir(pos_dir)
+    if not os.path.exists(neg_dir):
+        os.mkdir(neg_dir)
 
 
 def sanitize(text):
@@ -80,6 +115,9 @@ def make_file(text, sentiment, index):
     """
     Write a new file containing the given text to the output directory
     """
+    if packed:
+        packed_corpus.add_item(corpus_db, sanitize(text), sentiment, index)
+        return
     filename = "/{}_reddit_{}.txt".format(sentiment, index)
     if sentiment == "pos":
         directory = pos_dir
@@ -92,8 +130,180 @@ def make_file(text, sentiment, index):
 
 
 
+def load_feature_settings(config_file="config.yaml"):
+    """
+    Return the filter list and buckets polldit.py trains its classifier with, so that the rows
+    are ranked in the same feature space. The configuration module is not imported because it
+    connects to reddit.
+    """
+    if not os.path.exists(config_file):
+        return dict()
+    with open(config_file, 'r') as f:
+        config = yaml.safe_load(f)
+    return dict(filter_list=frozenset(config.get("filter_list", [])), buckets=config.get("feature_buckets"))
+
+
+def word_feats(words):
+    return features.word_feats(words, **feature_settings)
+
+
+def open_session_state():
+    """
+    Return a connection to the table recording which database rows have been labeled
+    """
+    if packed:
+        state = corpus_db
+    else:
+        state = sqlite3.connect(os.path.join(corpus_dir, "session.db"))
+    state.execute("CREATE TABLE IF NOT EXISTS labeled (mode TEXT, row INTEGER, label TEXT, PRIMARY KEY (mode, row))")
+    # highest row fetched into the window, and the rows of the window that are not labeled yet
+    state.execute("CREATE TABLE IF NOT EXISTS cursor (mode TEXT PRIMARY KEY, row INTEGER)")
+    state.execute("CREATE TABLE IF NOT EXISTS pending (mode TEXT, row INTEGER, PRIMARY KEY (mode, row))")
+    return state
+
+
+def next_index(sentiment):
+    """
+    Return the index following the highest index already used for the given sentiment
+    """
+    if packed:
+        fileids = [fileid for fileid, in corpus_db.execute("SELECT fileid FROM corpus WHERE label = ?", (sentiment,))]
+    else:
+        fileids = os.listdir(pos_dir if sentiment == "pos" else neg_dir)
+    indexes = [int(match.group(1)) for match in
+               (re.search(r"_reddit_(\d+)\.txt$", fileid) for fileid in fileids) if match]
+    return max(indexes) + 1 if indexes else 0
+
+
+def load_training_feats():
+    """
+    Return the (features, label) pairs of every item already in the corpus
+    """
+    if packed:
+        reader = packed_corpus.PackedCorpusReader(corpus_dir)
+    else:
+        from nltk.corpus.reader import CategorizedPlaintextCorpusReader
+        reader = CategorizedPlaintextCorpusReader(corpus_dir, r'(?!\.).*\.txt', cat_pattern=r'(neg|pos)/.*')
+    return [(word_feats(reader.words(fileids=[f])), label)
+            for label in ["neg", "pos"] for f in reader.fileids(label)]
+
+
+def train_session_classifier(feats):
+    """
+    Return a classifier trained on the given features, or None if either label has no examples
+    """
+    labels = set(label for _, label in feats)
+    if labels != {"neg", "pos"}:
+        return None
+    from nltk.classify import NaiveBayesClassifier
+    return NaiveBayesClassifier.train(feats)
+
+
+def uncertainty(classifier, text):
+    """
+    Return how far the classifier's positive probability for the text is from 0.5, so
+    that the most useful rows to label sort first
+    """
+    features = word_feats(packed_corpus.WORD_PATTERN.findall(sanitize(str(text.encode("ascii", "ignore")))))
+    return abs(classifier.prob_classify(features).prob("pos") - 0.5)
+
+
+def read_window(table, column, rows):
+    """
+    Return a dictionary of the given rows of the table mapped to their text
+    """
+    window = dict()
+    for offset in range(0, len(rows), MAX_PARAMETERS):
+        chunk = rows[offset:offset + MAX_PARAMETERS]
+        query = "SELECT rowid, {} FROM {} WHERE rowid IN ({})".format(column, table, ", ".join("?" * len(chunk)))
+        window.update((row, textCompression.decompressText(text, dictionaries))
+                      for row, text in db.execute(query, chunk) if text)
+    return window
+
+
+def run_session(mode):
+    """
+    Label the rows of the given mode ("submissions" or "comments"), resuming from any earlier
+    session and asking about the most uncertain rows of the window first
+    """
+    table, column = SOURCES[mode]
+    state = open_session_state()
+    labeled = set(row for row, in state.execute("SELECT row FROM labeled WHERE mode = ?", (mode,)))
+    pos_index = next_index("pos")
+    neg_index = next_index("neg")
+    feats = load_training_feats()
+    print("{} rows already labeled, {} items in the corpus".format(len(labeled), len(feats)))
+
+    # continue with the window of the previous session
+    cursor = state.execute("SELECT row FROM cursor WHERE mode = ?", (mode,)).fetchone()
+    last_row = cursor[0] if cursor else 0
+    window = read_window(table, column, [row for row, in state.execute("SELECT row FROM pending WHERE mode = ?",
+                                                                        (mode,)) if row not in labeled])
+    while True:
+        # top the window up with the rows following the last row fetched
+        while len(window) < PREFETCH_SIZE:
+            batch = db.execute("SELECT rowid, {} FROM {} WHERE rowid > ? ORDER BY rowid LIMIT ?".format(column, table),
+                               (last_row, PREFETCH_SIZE - len(window))).fetchall()
+            if not batch:
+                break
+            last_row = batch[-1][0]
+            added = dict((row, textCompression.decompressText(text, dictionaries)) for row, text in batch
+                         if row not in labeled and text)
+            window.update(added)
+            state.executemany("INSERT OR IGNORE INTO pending VALUES (?, ?)", [(mode, row) for row in added])
+            state.execute("INSERT OR REPLACE INTO cursor VALUES (?, ?)", (mode, last_row))
+            state.commit()
+        if not window:
+            print("Every row has been labeled.")
+            return
+
+        # retrain on everything labeled so far and queue the least certain rows first, or in table order
+        # until the corpus has examples of both labels
+        classifier = train_session_classifier(feats)
+        if classifier is not None:
+            queue = [(uncertainty(classifier, text), row) for row, text in window.items()]
+        else:
+            queue = [(0, row) for row in window]
+        heapq.heapify(queue)
+
+        for _ in range(min(RETRAIN_EVERY, len(queue))):
+            _, row = heapq.heappop(queue)
+            sanitized_text = str(window.pop(row).encode("ascii", "ignore"))
+            designation = input("\n[{} labeled] {}:  ".format(len(labeled), sanitized_text))
+            if designation in ['q', 'Q']:
+                return
+            if designation in ['p', 'P', '+']:
+                make_file(sanitized_text, "pos", pos_index)
+                pos_index += 1
+                label = "pos"
+            elif designation in ['n', 'N', '-']:
+                make_file(sanitized_text, "neg", neg_index)
+                neg_index += 1
+                label = "neg"
+            else:
+                label = "skip"
+            if label != "skip":
+                feats.append((word_feats(packed_corpus.WORD_PATTERN.findall(sanitize(sanitized_text))), label))
+            state.execute("INSERT OR REPLACE INTO labeled VALUES (?, ?, ?)", (mode, row, label))
+            state.execute("DELETE FROM pending WHERE mode = ? AND row = ?", (mode, row))
+            state.commit()
+            labeled.add(row)
+
+
+feature_settings = load_feature_settings()
+
 # read data to classify from the given SQLite database
-db = sqlite3.connect(database)
+db = dbPool.getPool(database).acquire()
+dictionaries = textCompression.loadDictionaries(db)
+
+if SESSION:
+    mode = input("Enter a mode (\"submissions\" or \"comments\"): ")
+    if mode not in SOURCES:
+        print("unknown mode: " + mode)
+        sys.exit(1)
+    run_session(mode)
+    sys.exit(0)
+
 
 pos_index = int(input("Starting positive index for the corpus: "))
 neg_index = int(input("Starting negative index for the corpus: "))
@@ -113,6 +323,7 @@ if mode == "submissions":
 
 elif mode == "comments":
     for text, in db.execute('select body from comments'):
+        text = textCompression.decompressText(text, dictionaries)
         clear()
         sanitized_text = str(text.encode("ascii", "ignore"))
         designation = input(sanitized_text + ":  ")
@@ -0,0 +1,152 @@
+"""
+packed_corpus.py
+
+Packed single-file storage for the labeled reddit_politics corpus. Every labeled item
+is a row of one SQLite file holding its file ID, label and text, which is read with a
+single sequential query instead of opening thousands of tiny text files.
+
+Usage (convert an existing corpus directory with pos/ and neg/ subdirectories):
+
+    python packed_corpus.py <corpus directory> <output .db file>
+
+"""
+import os
+import re
+import sys
+import sqlite3
+from urllib.parse import quote
+
+# same pattern as the WordPunctTokenizer used by NLTK's CategorizedPlaintextCorpusReader
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]+")
+
+CATEGORIES = ["neg", "pos"]
+
+
+def connect(path):
+    """
+    Open the packed corpus at the given path, creating its table if needed
+    """
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE IF NOT EXISTS corpus (fileid TEXT PRIMARY KEY, label TEXT, text TEXT)")
+    return connection
+
+
+def add_item(connection, text, label, index):
+    """
+    Add a labeled item to a packed corpus under the same file ID that
+    nltk_corpus_creator.make_file would give it
+
+    :param connection:  connection returned by connect
+    :param text:        the text content of the item
+    :param label:       "pos" or "neg"
+    :param index:       the index of the item within its label
+    :return:            the file ID of the new item
+    """
+    fileid = "{0}/{0}_reddit_{1}.txt".format(label, index)
+    connection.execute("INSERT OR REPLACE INTO corpus VALUES (?, ?, ?)", (fileid, label, text))
+    connection.commit()
+    return fileid
+
+
+def convert_directory(corpus_dir, path):
+    """
+    Pack a corpus directory laid out as <corpus_dir>/<label>/<file>.txt into a single file
+
+    :param corpus_dir:  the directory containing the pos and neg subdirectories
+    :param path:        the packed corpus file to write
+    :return:            the number of items packed
+    """
+    connection = connect(path)
+    count = 0
+    for label in CATEGORIES:
+        label_dir = os.path.join(corpus_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for filename in sorted(os.listdir(label_dir)):
+            if filename.startswith(".") or not filename.endswith(".txt"):
+                continue
+            with open(os.path.join(label_dir, filename), "r", encoding="utf-8") as f:
+                text = f.read()
+            connection.execute("INSERT OR REPLACE INTO corpus VALUES (?, ?, ?)",
+                               (label + "/" + filename, label, text))
+            count += 1
+    connection.commit()
+    connection.close()
+    return count
+
+
+class PackedCorpusReader:
+    """
+    Corpus reader for a packed corpus exposing the parts of the interface of NLTK's
+    CategorizedPlaintextCorpusReader used in this project. The whole corpus is loaded
+    with one sequential read the first time it is accessed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__texts = None
+        self.__labels = None
+
+    def __load(self):
+        if self.__texts is None:
+            texts = dict()
+            labels = dict()
+            connection = sqlite3.connect("file:{}?mode=ro".format(quote(os.path.abspath(self.path))), uri=True)
+            for fileid, label, text in connection.execute("SELECT fileid, label, text FROM corpus"):
+                texts[fileid] = text
+                labels[fileid] = label
+            connection.close()
+            self.__texts = texts
+            self.__labels = labels
+
+    def __resolve(self, fileids, categories):
+        if fileids is None:
+            return self.fileids(categories)
+        if isinstance(fileids, str):
+            return [fileids]
+        return fileids
+
+    def categories(self, fileids=None):
+        """
+        Return the sorted list of labels of the given file IDs or of the whole corpus
+        """
+        self.__load()
+        if fileids is None:
+            return sorted(set(self.__labels.values()))
+        return sorted(set(self.__labels[f] for f in self.__resolve(fileids, None)))
+
+    def fileids(self, categories=None):
+        """
+        Return the sorted list of file IDs, optionally only those with the given labels
+        """
+        self.__load()
+        if categories is None:
+            return sorted(self.__texts)
+        if isinstance(categories, str):
+            categories = [categories]
+        return sorted(f for f in self.__texts if self.__labels[f] in categories)
+
+    def raw(self, fileids=None, categories=None):
+        """
+        Return the concatenated text of the given file IDs
+        """
+        self.__load()
+        return "".join(self.__texts[f] for f in self.__resolve(fileids, categories))
+
+    def words(self, fileids=None, categories=None):
+        """
+        Return the list of word and punctuation tokens in the given file IDs
+        """
+        self.__load()
+        words = []
+        for f in self.__resolve(fileids, categories):
+            words += WORD_PATTERN.findall(self.__texts[f])
+        return words
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("syntax:   python packed_corpus.py <corpus directory> <output .db file>")
+        sys.exit(1)
+    count = convert_directory(sys.argv[1], sys.argv[2])
+    print("Packed", count, "items into", sys.argv[2])
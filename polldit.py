@@ -14,130 +14,286 @@ import utils
 import nltk
 import nltk.classify.util
 from nltk.classify import NaiveBayesClassifier
-from nltk.corpus import reddit_politics
-import sqlite3
 from configuration import *
 import random
 import pygal
-import re
 import math
 import webbrowser
+import time
+import statistics
+import dedup
+import bootstrap
+import snapshot
+import sampling
+import packed_corpus
+
+if CORPUS is not None:
+    reddit_politics = packed_corpus.PackedCorpusReader(CORPUS)
+else:
+    from nltk.corpus import reddit_politics
 
 DEBUG = False
 # control whether debugging messages are printed to the console
 if len(sys.argv) > 1 and sys.argv[1] in ['-d', '-DEBUG']:
     DEBUG = True
+
 warnings.filterwarnings("ignore")
-os.system('cls' if os.name == 'nt' else 'clear')
-print()
 
 
-def word_feats(words, filter_list):
-    return dict([(word, True) for word in words if word not in filter_list and len(word) > 2])
+# feature settings compared by model selection: the words left out, the length of the shortest word
+# used and the number of buckets words are hashed into, with the configured features first
+FEATURE_SETTINGS = [dict(filter_list=filter_list, min_length=min_length, buckets=buckets)
+                    for filter_list in [FILTER_SET, frozenset()]
+                    for min_length in [3, 2, 4]
+                    for buckets in [FEATURE_BUCKETS, 16384 if FEATURE_BUCKETS is None else None]]
+# standard error of the mean accuracy at which a feature setting is considered stable
+SELECTION_TOLERANCE = 0.005
 
 
-def create_classifier(iterations=100):
+def create_classifier(iterations=100, settings=None, time_budget=None, tolerance=None, report=None):
     """
-    Return the classifier that did the best at classifying a subset of the data
-    after training for the given number of iterations
-
-    :param iterations: number of iterations to test on
-    :return:    tuple: (classifier, accuracy of classifier) 
+    Return the classifier that did the best at classifying a subset of the data, out of the
+    classifiers trained on random splits of the data with the best of the given feature settings
+
+    Feature settings are compared by successive halving: in every round the remaining settings
+    share an equal part of the iterations and the better half of them by mean accuracy go on to
+    the next round, until a single setting is left to spend the rest of the iterations on.
+
+    :param iterations:  number of classifiers to train in total, at least one per setting
+    :param settings:    list of dictionaries of keyword arguments of utils.word_feats to compare,
+                        or None to only use the configured features
+    :param time_budget: optional number of seconds after which no more classifiers are trained
+    :param tolerance:   optional standard error of the mean accuracy of a setting at which it is
+                        stable and no more classifiers are trained with it
+    :param report:      optional dictionary that is filled with the settings evaluated, each with
+                        the number of classifiers trained and their mean and best accuracy, the
+                        settings chosen and the seconds spent
+    :return:    tuple: (classifier, accuracy of classifier)
     """
-    negids = reddit_politics.fileids('neg')
-    posids = reddit_politics.fileids('pos')
+    start = time.time()
+    if settings is None:
+        settings = [dict()]
+    negwords = [list(reddit_politics.words(fileids=[f])) for f in reddit_politics.fileids('neg')]
+    poswords = [list(reddit_politics.words(fileids=[f])) for f in reddit_politics.fileids('pos')]
+
+    # every setting is trained on the same random splits so that settings are compared on the same data
+    splits = []
+    def split(index):
+        while len(splits) <= index:
+            negorder = list(range(len(negwords)))
+            posorder = list(range(len(poswords)))
+            random.shuffle(negorder)
+            random.shuffle(posorder)
+            splits.append((negorder, posorder))
+        return splits[index]
+
+    results = [dict(settings=setting, accuracies=[], classifier=None, accuracy=0) for setting in settings]
+
+    def mean_accuracy(result):
+        return sum(result["accuracies"]) / len(result["accuracies"]) if result["accuracies"] else -1
+
+    def is_stable(result):
+        accuracies = result["accuracies"]
+        return tolerance is not None and len(accuracies) >= 3 and \
+            statistics.stdev(accuracies) / math.sqrt(len(accuracies)) <= tolerance
+
+    def out_of_time():
+        return time_budget is not None and time.time() - start >= time_budget
+
+    def train(result):
+        if "negfeats" not in result:
+            result["negfeats"] = [(utils.word_feats(words, **result["settings"]), 'neg') for words in negwords]
+            result["posfeats"] = [(utils.word_feats(words, **result["settings"]), 'pos') for words in poswords]
+        negorder, posorder = split(len(result["accuracies"]))
+        negfeats = [result["negfeats"][i] for i in negorder]
+        posfeats = [result["posfeats"][i] for i in posorder]
 
-    negfeats = [(word_feats(reddit_politics.words(fileids=[f]), FILTER_LIST), 'neg') for f in negids]
-    posfeats = [(word_feats(reddit_politics.words(fileids=[f]), FILTER_LIST), 'pos') for f in posids]
-    
-    # track the most accurate classifier so far
-    best_classifier = None
-    highest_accuracy = 0
-    for iter_num in range(iterations):
-        # randomly shuffle the feature sets to get new subsets to test and train on
-        random.shuffle(negfeats)
-        random.shuffle(posfeats)
-    
         negcutoff = int(len(negfeats) * 3 / 4)
         poscutoff = int(len(posfeats) * 3 / 4)
-    
-        trainfeats = negfeats[:negcutoff] + posfeats[:poscutoff]#negfeats[:negcutoff] + posfeats[:poscutoff]
-        testfeats = negfeats[negcutoff:] + posfeats[poscutoff:]#negfeats[negcutoff:] + posfeats[poscutoff:]
+
+        trainfeats = negfeats[:negcutoff] + posfeats[:poscutoff]
+        testfeats = negfeats[negcutoff:] + posfeats[poscutoff:]
 
         if DEBUG: print('Train on %d instances, test on %d instances.\n' % (len(trainfeats), len(testfeats)))
-     
+
         # train the classifier on the training features and determine its accuracy
         classifier = NaiveBayesClassifier.train(trainfeats)
         accuracy = nltk.classify.util.accuracy(classifier, testfeats)
 
         if DEBUG: print('\nAccuracy:', accuracy)
 
-        # if this classifier outperformed all before it, track it and its accuracy
-        if accuracy > highest_accuracy:
-            highest_accuracy = accuracy
-            best_classifier = classifier
-        utils.update_progress(iter_num / iterations, message="Testing Classifiers")
+        # if this classifier outperformed all before it with the same settings, track it and its accuracy
+        result["accuracies"].append(accuracy)
+        if result["classifier"] is None or accuracy > result["accuracy"]:
+            result["accuracy"] = accuracy
+            result["classifier"] = classifier
+
+    remaining = list(results)
+    rounds = int(math.ceil(math.log(len(results), 2))) + 1
+    trained = 0
+    for round_num in range(rounds):
+        if len(remaining) == 1:
+            per_setting = max(iterations - trained, 1)
+        else:
+            per_setting = max(iterations // rounds // len(remaining), 1)
+        for result in remaining:
+            for _ in range(per_setting):
+                if is_stable(result) or (out_of_time() and result["accuracies"]):
+                    break
+                train(result)
+                trained += 1
+                utils.update_progress(min(trained / iterations, 1), message="Testing Classifiers")
+        if len(remaining) == 1 or out_of_time():
+            break
+
+        # keep the better half of the settings, and free the features of the others
+        remaining.sort(key=mean_accuracy, reverse=True)
+        for result in remaining[(len(remaining) + 1) // 2:]:
+            del result["negfeats"], result["posfeats"]
+        remaining = remaining[:(len(remaining) + 1) // 2]
     sys.stdout.write("\n\n")
-    return (classifier, highest_accuracy)
 
+    best = max(remaining, key=mean_accuracy)
+    # classify with the same features the classifier was trained with
+    best["classifier"].feature_settings = best["settings"]
 
-def get_posts(start_date, end_date):
+    if report is not None:
+        report["evaluated"] = [dict(settings=result["settings"], trained=len(result["accuracies"]),
+                                    mean=mean_accuracy(result), best=result["accuracy"])
+                               for result in results if result["accuracies"]]
+        report["chosen"] = best["settings"]
+        report["seconds"] = time.time() - start
+    return (best["classifier"], best["accuracy"])
+
+
+def get_posts(start_date, end_date, workers=1, connection=None, database=DB, scanned_posts=None):
     """
     Return a dictionary of candidate names mapped to the tuples containing the score and
     the text of a piece of Reddit content
 
     :param start_date: the integer start date of the time interval in YYYYMMDDHHMMSS format
     :param end_date: the integer end date of the time interval in YYYYMMDDHHMMSS format 
+    :param workers: the number of processes to split the time interval between
+    :param connection: an open connection to the database to use instead of opening a new one
+    :param database: the database file or directory of partitions to scan
+    :param scanned_posts: optional list that is filled with the tuples scanned from the database,
+                          as generated by utils.scan_posts
     """
-    connection = sqlite3.connect(DB)
-    db = connection.cursor()
-    
-    results = []
-    comments = db.execute("SELECT * FROM COMMENTS WHERE date >= ? AND date <= ?", (start_date, end_date))
-    
+    if workers > 1:
+        scanned = utils.parallel_scan_posts(start_date, end_date, workers, database=database)
+    else:
+        scanned = utils.scan_posts(start_date, end_date, connection=connection, database=database)
+
     # keys are candidates, values are lists of tuples with score and content
     posts = dict()
-    
-    for date, user, body, score, post_id in comments:
-        for candidate in CANDIDATES:
-            for name in CANDIDATES[candidate]:
-                # generate a regular expression that ensures that the name isn't part of another word
-                regex = r"^.* " + name
-                if re.match(regex, body.lower()):
-                    if candidate not in posts:
-                        posts[candidate] = []
-                    posts[candidate].append((score, body.lower()))
-    
-    submissions = db.execute("SELECT * FROM SUBMISSIONS WHERE postDate >= ? AND postDate <= ?", (start_date, end_date))
-    
-    for postID, title, body, score, date, subreddit_name, subreddit_id in submissions:
-        for candidate in CANDIDATES:
-            for name in CANDIDATES[candidate]:
-                # generate a regular expression that ensures that the name isn't part of another word
-                regex = r"^.* " + name
-                if re.match(regex, (title + "\n" + body).lower()):
-                    if candidate not in posts:
-                        posts[candidate] = []
-                    posts[candidate].append((score, (title + "\n" + body).lower()))
-
-    connection.close()
+    for post in scanned:
+        source, rowid, date, score, text, matches = post
+        if scanned_posts is not None:
+            scanned_posts.append(post)
+        for candidate in matches:
+            if candidate not in posts:
+                posts[candidate] = []
+            posts[candidate].append((score, text))
     return posts
 
 
-def classify(classifier, text, score):
+def score_posts(classifier, posts, progress=False, dedup_threshold=None, report=None, values=None,
+                probabilities=None):
     """
-    Returns a numeric classification value of the text using the given NLTK Classifier and
-    taking into account the score associated with the given text
+    Classify the posts found for each candidate and total their sentiment values
+
+    :param classifier:      the NLTK Classifier to use for sentiment analysis
+    :param posts:           dictionary of candidates mapped to (score, text) tuples as returned by get_posts
+    :param progress:        whether to display a progress bar for each candidate
+    :param dedup_threshold: if given, classify each group of texts with at least this estimated
+                            similarity once and apply its result to every member's score
+    :param report:          optional dictionary that is filled with the number of texts, the number
+                            of texts actually classified and the seconds spent doing so
+    :param values:          optional dictionary that is filled with a list of the sentiment values
+                            of the posts of every candidate
+    :param probabilities:   optional dictionary that is filled with the (pos, neg) probabilities
+                            applied to every text
+    :return:                tuple: (dict of candidate -> sum of sentiment values,
+                                    dict of candidate -> number of posts, total number of posts)
+    """
+    # a post mentioning several candidates appears once per candidate, so classify each text once
+    texts = list(collections.OrderedDict.fromkeys(text for candidate in posts for score, text in posts[candidate]))
+    if dedup_threshold is not None:
+        groups = dedup.group_texts(texts, dedup_threshold)
+        representative = dict((text, texts[group]) for text, group in zip(texts, groups))
+    else:
+        representative = dict((text, text) for text in texts)
+    classified = dict()
+    classify_seconds = 0
+
+    sums = dict()
+    totals = dict()
+    overall_total = 0
+    num_candidates = len(list(posts.keys()))
+    current = 1
+    for candidate in posts:
+        sums[candidate] = 0
+        totals[candidate] = 0
+        for score, text in posts[candidate]:
+            group_text = representative[text]
+            if group_text not in classified:
+                start = time.time()
+                classified[group_text] = text_probabilities(classifier, group_text)
+                classify_seconds += time.time() - start
+            pos_prob, neg_prob = classified[group_text]
+            value = sentiment_value(pos_prob, neg_prob, score)
+            sums[candidate] += value
+            if values is not None:
+                values.setdefault(candidate, []).append(value)
+            totals[candidate] += 1
+            overall_total += 1
+        if progress: utils.update_progress(current / num_candidates, message=candidate)
+        current += 1
+
+    if report is not None:
+        report["texts"] = len(texts)
+        report["classified"] = len(classified)
+        report["seconds"] = classify_seconds
+    if probabilities is not None:
+        probabilities.update((text, classified[representative[text]]) for text in texts)
+    return sums, totals, overall_total
+
+
+def export_snapshot(scanned_posts, probabilities, directory):
+    """
+    Write already scored posts to a columnar snapshot that later runs can aggregate
+    without the database or classifier
+
+    :param scanned_posts:   list of the posts scanned by get_posts
+    :param probabilities:   dictionary of the (pos, neg) probabilities of every text as filled by score_posts
+    :param directory:       the directory to write the snapshot to
+    :return:                the number of posts written
+    """
+    rows = ((date, score, sentiment_value(probabilities[text][0], probabilities[text][1], score), matches, text)
+            for source, rowid, date, score, text, matches in scanned_posts)
+    return snapshot.write_snapshot(directory, rows)
+
+
+def text_probabilities(classifier, text):
+    """
+    Returns the probabilities that the text is positive and negative according to the
+    given NLTK Classifier
 
     :param classifier:  the NLTK Classifier to use for sentiment analysis
     :param text:        the text content to analyze
-    :return:            a numeric value representing the overall sentiment of this Reddit content
+    :return:            tuple: (probability of "pos", probability of "neg")
     """
-    feature = word_feats(text.split(), [])
+    settings = getattr(classifier, "feature_settings", dict())
+    feature = utils.word_feats(text.split(), **dict(settings, filter_list=()))
     probabilities = classifier.prob_classify(feature)
-    label = probabilities.max()
-    pos_prob = probabilities.prob("pos")
-    neg_prob = probabilities.prob("neg")
+    return probabilities.prob("pos"), probabilities.prob("neg")
+
+
+def sentiment_value(pos_prob, neg_prob, score):
+    """
+    Returns the numeric sentiment value of Reddit content with the given classification
+    probabilities, taking into account the score associated with it
+    """
     if score >= 0 and pos_prob >= 0.5:
         value = math.log1p(score + 1)
     elif score < 0 and neg_prob >= 0.5:
@@ -149,51 +305,66 @@ def classify(classifier, text, score):
     return value + 1
 
 
+def classify(classifier, text, score):
+    """
+    Returns a numeric classification value of the text using the given NLTK Classifier and
+    taking into account the score associated with the given text
 
-# entry point into the program
-if __name__ == "__main__":
+    :param classifier:  the NLTK Classifier to use for sentiment analysis
+    :param text:        the text content to analyze
+    :return:            a numeric value representing the overall sentiment of this Reddit content
+    """
+    pos_prob, neg_prob = text_probabilities(classifier, text)
+    return sentiment_value(pos_prob, neg_prob, score)
+
+
+
+def relative_sentiments(sums, overall_total):
+    """
+    Return the sentiment of every candidate relative to the least favored candidate
+
+    :param sums:            dictionary of candidates mapped to the sum of their sentiment values
+    :param overall_total:   the total number of candidate mentions the sums were taken over
+    :return:                dictionary of every candidate mapped to their sentiment normalized to 0,
+                            where higher is more positive
+    """
+    # avoid division by 0 errors if no candidates were found
+    overall_total = max(overall_total, 1)
 
-    # generate a classifier to use for sentiment analysis
-    classifier, accuracy = create_classifier()
-    print("Best classifier accuracy: ", accuracy)
-    if DEBUG: classifier.show_most_informative_features(n=10)
-    
-    start_date = int(input("\nEnter the start datetime (YYYYMMDDHHMMSS): "))
-    end_date = int(input("Enter the end datetime (YYYYMMDDHHMMSS): "))
-    
-    posts = get_posts(start_date, end_date)
-    
-    # dictionary containing candidates mapped to lists of sentiment values for that candidate
-    sentiments = dict()
-    totals = dict()
-    overall_total = 0
-    num_candidates = len(list(posts.keys()))
-    current = 1
-    for candidate in posts:
-        sentiments[candidate] = []
-        totals[candidate] = 0
-        for score, text in posts[candidate]:
-            sentiments[candidate].append(classify(classifier, text, score))
-            totals[candidate] += 1
-            overall_total += 1
-        utils.update_progress(current / num_candidates, message=candidate)
-        current += 1
-    # clear the progress bars for the candidates
-    sys.stdout.write("\r" + " " * 70 + "\n")
-    
     # normalize the values to 0
     lowest = 0
-    for candidate in sentiments:
-        avg = sum(sentiments[candidate]) / overall_total
+    for candidate in sums:
+        avg = sums[candidate] / overall_total
         if avg < lowest:
             lowest = avg
 
-    # display sentiment values for each candidate to the console
-    print("\nRelative Sentiment Values:")
-    print("(normalized to 0, higher is more positive)\n")
-    for candidate in sentiments:
-        print("\t", "{0: <12}".format(candidate), (sum(sentiments[candidate]) / overall_total) - lowest)
+    relative = dict()
+    for candidate in CANDIDATE_LIST:
+        relative[candidate] = sums.get(candidate, 0) / overall_total - lowest
+    return relative
+
+
+def chart_value(candidate, relative, intervals):
+    """
+    Return the value to plot for a candidate, with its confidence interval as error bars if known
+    """
+    # since these graphs are relative only, add a slight offset to each of them so that the candidate
+    # with the least approval does not appear to be missing from the graph
+    value = relative[candidate] + 0.01
+    if intervals is None or candidate not in intervals:
+        return value
+    low, high = intervals[candidate]
+    return {"value": value, "ci": {"low": low + 0.01, "high": high + 0.01}}
 
+
+def render_charts(relative, intervals=None):
+    """
+    Render the relative sentiment of the candidates to svg charts in the output directory
+    and display them with the default browser
+
+    :param relative:    dictionary of candidates mapped to their relative sentiment values
+    :param intervals:   optional dictionary of candidates mapped to (low, high) confidence intervals
+    """
     # ensure that an output directory exists
     if not os.path.exists("output"):
         os.mkdir("output")
@@ -203,14 +374,7 @@ if __name__ == "__main__":
     democrat_chart.title = "Reddit Democratic Candidate Sentiment"
     DEMOCRATS.sort()
     for candidate in DEMOCRATS:
-        if candidate not in sentiments:
-            sentiments[candidate] = [0]
-            # avoid division by 0 errors if the candidate was not found 
-            totals[candidate] = 1
-
-        # since these graphs are relative only, add a slight offset to each of them so that the candidate
-        # with the least approval does not appear to be missing from the graph
-        democrat_chart.add(candidate, (sum(sentiments[candidate]) / overall_total) - lowest + 0.01)
+        democrat_chart.add(candidate, chart_value(candidate, relative, intervals))
 
     # save the chart to a file and display the svg with the default browser
     democrat_chart.render_to_file("output/democrats.svg")
@@ -222,10 +386,7 @@ if __name__ == "__main__":
     republican_chart.title = "Reddit Republican Candidate Sentiment"
     REPUBLICANS.sort()
     for candidate in REPUBLICANS:
-        if candidate not in sentiments:
-            sentiments[candidate] = [0]
-            totals[candidate] = 1
-        republican_chart.add(candidate, (sum(sentiments[candidate]) / overall_total) - lowest + 0.01)
+        republican_chart.add(candidate, chart_value(candidate, relative, intervals))
     republican_chart.render_to_file("output/republicans.svg")
     webbrowser.open_new_tab('file://' + os.path.realpath("output/republicans.svg"))
 
@@ -235,6 +396,128 @@ if __name__ == "__main__":
     all_chart.title = "Reddit Presidential Candidate Sentiment"
     all_candidates = DEMOCRATS + REPUBLICANS
     for candidate in all_candidates:
-        all_chart.add(candidate, (sum(sentiments[candidate]) / overall_total) - lowest + 0.01)
+        all_chart.add(candidate, chart_value(candidate, relative, intervals))
     all_chart.render_to_file("output/all_candidates.svg")
-    webbrowser.open_new_tab('file://' + os.path.realpath("output/all_candidates.svg"))
\ No newline at end of file
+    webbrowser.open_new_tab('file://' + os.path.realpath("output/all_candidates.svg"))
+
+
+# entry point into the program
+if __name__ == "__main__":
+
+    # directories to export a columnar snapshot to or to aggregate from instead of the database
+    SNAPSHOT_EXPORT = None
+    SNAPSHOT = None
+    # number of processes to scan the database with
+    WORKERS = 1
+    # similarity threshold for classifying near-duplicate posts once
+    DEDUP_THRESHOLD = None
+    # number of bootstrap resamples for confidence intervals, or None to skip them
+    RESAMPLES = None
+    # error tolerance and time budget of the approximate mode, or None for an exact answer
+    TOLERANCE = None
+    TIME_BUDGET = sampling.TIME_BUDGET
+    # seconds to spend selecting the feature settings of the classifier, or None to use the configured ones
+    SELECTION_BUDGET = None
+    try:
+        for index, flag in enumerate(sys.argv):
+            if flag == "-w":
+                WORKERS = int(sys.argv[index + 1])
+            elif flag == "-b":
+                RESAMPLES = int(sys.argv[index + 1])
+            elif flag == "-D":
+                DEDUP_THRESHOLD = float(sys.argv[index + 1])
+            elif flag == "-e":
+                SNAPSHOT_EXPORT = sys.argv[index + 1]
+            elif flag == "-s":
+                SNAPSHOT = sys.argv[index + 1]
+            elif flag == "-a":
+                TOLERANCE = float(sys.argv[index + 1])
+            elif flag == "-t":
+                TIME_BUDGET = float(sys.argv[index + 1])
+            elif flag == "-m":
+                SELECTION_BUDGET = float(sys.argv[index + 1])
+    except (IndexError, ValueError):
+        print("Syntax:  python polldit.py [-d] [-w workers] [-D dedup_threshold] [-b resamples] [-e export_snapshot_dir] [-s snapshot_dir] [-a tolerance [-t seconds]] [-m selection_seconds]")
+        sys.exit(1)
+    # a snapshot is already classified, so aggregating all of it is faster than sampling
+    if SNAPSHOT is not None:
+        TOLERANCE = None
+    os.system('cls' if os.name == 'nt' else 'clear')
+    print()
+
+    if SNAPSHOT is None:
+        # generate a classifier to use for sentiment analysis
+        if SELECTION_BUDGET is not None:
+            selection = dict()
+            classifier, accuracy = create_classifier(settings=FEATURE_SETTINGS, time_budget=SELECTION_BUDGET,
+                                                     tolerance=SELECTION_TOLERANCE, report=selection)
+            print("Evaluated {} feature settings in {:.2f}s:".format(len(selection["evaluated"]),
+                                                                     selection["seconds"]))
+            for entry in sorted(selection["evaluated"], key=lambda entry: entry["mean"], reverse=True):
+                print("\t{:.4f} mean, {:.4f} best of {: <3} filter list: {: <5} min length: {}  buckets: {}".format(
+                    entry["mean"], entry["best"], entry["trained"], bool(entry["settings"]["filter_list"]),
+                    entry["settings"]["min_length"], entry["settings"]["buckets"]))
+        else:
+            classifier, accuracy = create_classifier()
+        print("Best classifier accuracy: ", accuracy)
+        if DEBUG: classifier.show_most_informative_features(n=10)
+    
+    start_date = int(input("\nEnter the start datetime (YYYYMMDDHHMMSS): "))
+    end_date = int(input("Enter the end datetime (YYYYMMDDHHMMSS): "))
+
+    intervals = None
+    if TOLERANCE is not None:
+        # classify only a stratified sample of the posts and bound the error of the estimate
+        report = dict()
+        sums, overall_total, errors = sampling.approximate_sentiment(
+            lambda text, score: classify(classifier, text, score), start_date, end_date, tolerance=TOLERANCE,
+            time_budget=TIME_BUDGET, report=report)
+        print("Sampled {} of {} posts in {:.2f}s".format(report["sampled"], report["rows"], report["seconds"]))
+        relative = relative_sentiments(sums, overall_total)
+        intervals = dict((candidate, (max(relative[candidate] - errors[candidate], 0),
+                                      relative[candidate] + errors[candidate])) for candidate in errors)
+    elif SNAPSHOT is not None:
+        # aggregate the already classified posts in the snapshot with vectorized filters
+        posts_snapshot = snapshot.Snapshot(SNAPSHOT)
+        sums, totals = posts_snapshot.aggregate(start_date, end_date)
+        overall_total = sum(totals.values())
+        values = dict((candidate, posts_snapshot.candidate_values(candidate, start_date, end_date))
+                      for candidate in sums)
+    else:
+        # keep the scanned posts and their probabilities only when they are exported
+        scanned_posts = [] if SNAPSHOT_EXPORT is not None else None
+        probabilities = dict() if SNAPSHOT_EXPORT is not None else None
+        posts = get_posts(start_date, end_date, workers=WORKERS, scanned_posts=scanned_posts)
+        report = dict()
+        values = dict()
+        sums, totals, overall_total = score_posts(classifier, posts, progress=True, dedup_threshold=DEDUP_THRESHOLD,
+                                                  report=report, values=values, probabilities=probabilities)
+        # clear the progress bars for the candidates
+        sys.stdout.write("\r" + " " * 70 + "\n")
+
+        if DEDUP_THRESHOLD is not None and report["classified"] > 0:
+            per_text = report["seconds"] / report["classified"]
+            print("Classified {} groups for {} distinct texts (dedup ratio {:.3f}), saving about {:.2f}s".format(
+                report["classified"], report["texts"], report["texts"] / report["classified"],
+                per_text * (report["texts"] - report["classified"])))
+
+        if SNAPSHOT_EXPORT is not None:
+            rows = export_snapshot(scanned_posts, probabilities, SNAPSHOT_EXPORT)
+            print("Exported", rows, "posts to snapshot", SNAPSHOT_EXPORT)
+
+    if TOLERANCE is None:
+        relative = relative_sentiments(sums, overall_total)
+        if RESAMPLES is not None:
+            intervals = bootstrap.confidence_intervals(values, resamples=RESAMPLES)
+
+    # display sentiment values for each candidate to the console
+    print("\nRelative Sentiment Values:")
+    print("(normalized to 0, higher is more positive)\n")
+    for candidate in sums:
+        if intervals is not None and candidate in intervals:
+            print("\t", "{0: <12}".format(candidate), relative[candidate],
+                  "({:.0%} CI: {:.4f} to {:.4f})".format(bootstrap.CONFIDENCE, *intervals[candidate]))
+        else:
+            print("\t", "{0: <12}".format(candidate), relative[candidate])
+
+    render_charts(relative, intervals)
@@ -12,12 +12,18 @@ import os
 import warnings
 from configuration import *
 from reddit_dataset import redditDataset
+from reddit_dataset import responseCache
 
 
 warnings.filterwarnings("ignore")
 
+# --offline rebuilds the database from cached responses only, without contacting reddit
+offline = "--offline" in sys.argv
+if offline:
+    sys.argv.remove("--offline")
+
 if len(sys.argv) != 4:
-    print("syntax:   python populate_db.py start_date(YYMMDDHHMMSS) end_date(YYMMDDHHMMSS) database_path")
+    print("syntax:   python populate_db.py start_date(YYMMDDHHMMSS) end_date(YYMMDDHHMMSS) database_path [--offline]")
     sys.exit(1)
 
 # extract the name of the db from the file path
@@ -35,9 +41,19 @@ if len(path) == 0:
     path = os.getcwd()
 
 
+cache = None
+if RESPONSE_CACHE is not None:
+    cache = responseCache.ResponseCache(RESPONSE_CACHE, ttl=RESPONSE_CACHE_TTL,
+                                        recentDays=RESPONSE_CACHE_RECENT_DAYS, offline=offline)
+elif offline:
+    print("--offline needs response_cache set in config.yaml")
+    sys.exit(1)
+
+
 # generate the Reddit database
 subs = redditDataset.getSubreddits(REDDIT, SUBREDDITS)
 redditDataset.createDataset(
     REDDIT, subs, startDate=start, endDate=end,
-    dbName=name, dbPath=path, fineScale=4, keywords=ALL_NAMES)
+    dbName=name, dbPath=path, fineScale=4, keywords=ALL_NAMES, compressText=COMPRESS_TEXT,
+    partitionBy=PARTITION_BY, cache=cache)
 
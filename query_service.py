@@ -0,0 +1,172 @@
+"""
+query_service.py
+
+Long-running local HTTP service answering sentiment queries over the configured
+database. The classifier is trained and the database is opened once at start-up,
+and results are kept in an LRU cache keyed by the queried time interval and the
+version of the database, so repeated queries are answered without rescanning.
+
+Usage:
+
+    python query_service.py [-p port] [-i training_iterations] [-c cache_size]
+
+Query:
+
+    GET /sentiment?start=YYYYMMDDHHMMSS&end=YYYYMMDDHHMMSS&candidates=sanders,trump
+"""
+import os
+import sys
+import json
+import threading
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import utils
+import polldit
+from reddit_dataset import dbPartitions
+from configuration import DB, CANDIDATE_LIST
+
+PORT = 8000
+ITERATIONS = 100
+CACHE_SIZE = 128
+
+
+class SentimentService:
+    """
+    Holds the warm classifier, the pooled database connections and the result cache
+    """
+
+    def __init__(self, classifier, database=DB, cache_size=CACHE_SIZE):
+        self.classifier = classifier
+        self.database = database
+        self.partitioned = dbPartitions.isPartitioned(database)
+        if not self.partitioned:
+            self.pool = utils.read_pool(database)
+            # connection kept out of the pool to check the database version on
+            self.connection = self.pool.acquire()
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def version(self):
+        """
+        Return a stamp that changes whenever another connection commits to the database
+        """
+        if self.partitioned:
+            # every commit rewrites the partition file, so its modification time changes
+            return tuple((key, os.stat(path).st_mtime_ns, os.stat(path).st_size)
+                         for key, path in dbPartitions.listPartitions(self.database))
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def sentiment(self, start_date, end_date):
+        """
+        Return the relative sentiment and the number of posts of every candidate within
+        the given time interval, from the cache when the database has not changed
+
+        :param start_date: the integer start date of the time interval in YYYYMMDDHHMMSS format
+        :param end_date: the integer end date of the time interval in YYYYMMDDHHMMSS format
+        :return: tuple: (dict of candidate -> relative sentiment, dict of candidate -> post count)
+        """
+        with self.lock:
+            key = (start_date, end_date, self.version())
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        # scan on pooled connections so that queries missing the cache run concurrently
+        if self.partitioned:
+            posts = polldit.get_posts(start_date, end_date, database=self.database)
+        else:
+            with self.pool.connection() as connection:
+                posts = polldit.get_posts(start_date, end_date, connection=connection)
+        sums, totals, overall_total = polldit.score_posts(self.classifier, posts)
+        result = (polldit.relative_sentiments(sums, overall_total), totals)
+
+        with self.lock:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return result
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /sentiment requests with JSON using the server's SentimentService
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/sentiment":
+            self.respond(404, {"error": "unknown path " + url.path})
+            return
+
+        query = parse_qs(url.query)
+        try:
+            start_date = int(query["start"][0])
+            end_date = int(query["end"][0])
+        except (KeyError, ValueError):
+            self.respond(400, {"error": "start and end must be given in YYYYMMDDHHMMSS format"})
+            return
+        if "candidates" in query:
+            candidates = [name for value in query["candidates"] for name in value.split(",") if name]
+        else:
+            candidates = CANDIDATE_LIST
+        unknown = [candidate for candidate in candidates if candidate not in CANDIDATE_LIST]
+        if unknown:
+            self.respond(400, {"error": "unknown candidates: " + ", ".join(unknown)})
+            return
+
+        relative, totals = self.server.service.sentiment(start_date, end_date)
+        self.respond(200, {
+            "start": start_date,
+            "end": end_date,
+            "sentiment": dict((candidate, relative[candidate]) for candidate in candidates),
+            "posts": dict((candidate, totals.get(candidate, 0)) for candidate in candidates),
+        })
+
+    def respond(self, status, body):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if polldit.DEBUG:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server holding the SentimentService its handlers query
+    """
+
+    def __init__(self, address, service):
+        ThreadingHTTPServer.__init__(self, address, QueryHandler)
+        self.service = service
+
+
+if __name__ == "__main__":
+    # process command line inputs
+    try:
+        for index, flag in enumerate(sys.argv):
+            if flag == "-p":
+                PORT = int(sys.argv[index + 1])
+            elif flag == "-i":
+                ITERATIONS = int(sys.argv[index + 1])
+            elif flag == "-c":
+                CACHE_SIZE = int(sys.argv[index + 1])
+    except (IndexError, ValueError):
+        print("Syntax:  python query_service.py [-p port] [-i training_iterations] [-c cache_size]")
+        sys.exit(1)
+
+    classifier, accuracy = polldit.create_classifier(ITERATIONS)
+    print("Best classifier accuracy: ", accuracy)
+
+    server = QueryServer(("127.0.0.1", PORT), SentimentService(classifier, cache_size=CACHE_SIZE))
+    print("Serving sentiment queries on http://127.0.0.1:{}/sentiment".format(PORT))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
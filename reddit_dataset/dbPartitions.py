@@ -0,0 +1,210 @@
+import os
+import re
+import stat
+import sqlite3
+import datetime
+from reddit_dataset import dbPool
+from reddit_dataset import textCompression
+
+# number of leading digits of a YYYYMMDDHHMMSS date that make up each kind of partition key
+KEY_LENGTHS = {'year': 4, 'month': 6, 'day': 8}
+
+
+def partitionKey(date, partitionBy='month'):
+    """
+    :param date: integer date in YYYYMMDDHHMMSS format
+    :param partitionBy: 'year', 'month' or 'day'
+    :return: the key of the partition holding the date, e.g. '201512' for months
+    """
+    return str(date)[:KEY_LENGTHS[partitionBy]]
+
+
+def partitionPath(directory, dbName, key):
+    """
+    :param directory: directory of the partitions
+    :param dbName: base of database name
+    :param key: partition key
+    :return: path of the partition file
+    """
+    return os.path.abspath(os.path.join(directory, '{}_{}.db'.format(dbName, key)))
+
+
+def listPartitions(directory):
+    """
+    :param directory: directory of the partitions
+    :return: list of (key, path) tuples of every partition, in chronological order
+    """
+    partitions = []
+    for fileName in os.listdir(directory):
+        match = re.match(r'.*_(\d+)\.db$', fileName)
+        if match is not None:
+            partitions.append((match.group(1), os.path.abspath(os.path.join(directory, fileName))))
+    return sorted(partitions)
+
+
+def partitionsForRange(directory, startDate, endDate):
+    """
+    Routes a date range to the partitions that can hold rows within it
+    :param directory: directory of the partitions
+    :param startDate: integer start date in YYYYMMDDHHMMSS format
+    :param endDate: integer end date in YYYYMMDDHHMMSS format
+    :return: list of (key, path) tuples of the overlapping partitions, in chronological order
+    """
+    return [(key, path) for key, path in listPartitions(directory)
+            if str(startDate)[:len(key)] <= key <= str(endDate)[:len(key)]]
+
+
+def isPartitioned(path):
+    """
+    :param path: path of a database file or of a directory of partitions
+    :return: whether the path is a directory of partitions
+    """
+    return os.path.isdir(path)
+
+
+class PartitionedRedditDB:
+    """
+    Writes a reddit data set into one database file per time partition, with the same interface as RedditDB
+    """
+
+    def __init__(self, dbName='reddit', dbPath=None, partitionBy='month', **dbSettings):
+        """
+        :param dbName: base of database name; the partitions are stored in a directory of this name
+        :param dbPath: directory containing the partition directory
+        :param partitionBy: 'year', 'month' or 'day'
+        :param dbSettings: keyword arguments of RedditDB used for each partition
+        """
+        if partitionBy not in KEY_LENGTHS:
+            raise ValueError('partitionBy must be one of ' + ', '.join(sorted(KEY_LENGTHS)))
+        if dbPath is None:
+            dbPath = os.path.abspath(os.path.join(os.path.expanduser('~'), 'Databases'))
+        self.__dbName = dbName
+        self.__directory = os.path.abspath(os.path.join(dbPath, dbName))
+        self.__partitionBy = partitionBy
+        self.__dbSettings = dbSettings
+        self.__partitions = dict()
+
+    def getDatabasePath(self):
+        """
+        :return: full absolute path of the partition directory
+        """
+        return self.__directory
+
+    def __partition(self, created):
+        """
+        :param created: unix timestamp of a comment or post
+        :return: RedditDB of the partition the timestamp falls in
+        """
+        from reddit_dataset.redditDataset import RedditDB
+
+        dateStr = datetime.datetime.fromtimestamp(created).strftime('%Y%m%d%H%M%S')
+        key = partitionKey(dateStr, self.__partitionBy)
+        if key not in self.__partitions:
+            # start new partitions with the dictionary an earlier partition trained, instead of each
+            # storing plain text until it has enough of its own
+            dictionaries = [partition.getDictionary() for partition in self.__partitions.values()
+                            if partition.getDictionary()]
+            self.__partitions[key] = RedditDB(dbName='{}_{}'.format(self.__dbName, key), dbPath=self.__directory,
+                                              dictionary=dictionaries[0] if dictionaries else None,
+                                              **self.__dbSettings)
+        return self.__partitions[key]
+
+    def saveCommentData(self, comment):
+        self.__partition(comment.created_utc).saveCommentData(comment)
+
+    def saveSubmission(self, post):
+        self.__partition(post.created_utc).saveSubmission(post)
+
+    def getSubreddits(self):
+        """ Extracts a list of distinct subreddits over all partitions """
+        counts = dict()
+        for key, path in listPartitions(self.__directory):
+            with dbPool.getPool(path).connection() as connection:
+                for name, count in connection.execute('select subredditName, count(*) from submissions '
+                                                      'group by subredditName'):
+                    counts[name] = counts.get(name, 0) + count
+        return sorted(counts, key=counts.get, reverse=True)
+
+    def getSubredditCommentText(self, subreddit):
+        """ Grabs all comment text from a given subreddit over all partitions """
+        partitions = listPartitions(self.__directory)
+
+        # comments can land in a later partition than their post, so collect the posts first
+        postIDs = set()
+        for key, path in partitions:
+            with dbPool.getPool(path).connection() as connection:
+                postIDs.update(row[0] for row in connection.execute('select postID from submissions '
+                                                                    'where subredditName = ?', [subreddit]))
+        comments = []
+        for key, path in partitions:
+            with dbPool.getPool(path).connection() as connection:
+                dictionaries = textCompression.loadDictionaries(connection)
+                comments += [textCompression.decompressText(body, dictionaries)
+                             for postID, body in connection.execute('select postID, body from comments')
+                             if postID in postIDs]
+        return comments
+
+    def closeConnection(self):
+        for partition in self.__partitions.values():
+            partition.closeConnection()
+
+
+def partitionDB(source, directory, dbName=None, partitionBy='month'):
+    """
+    Splits a single database into time partitions
+    :param source: path of the database to split
+    :param directory: directory to write the partitions to
+    :param dbName: base of the partition names. Default is the name of the source database.
+    :param partitionBy: 'year', 'month' or 'day'
+    :return: list of the paths of the partitions written
+    """
+    if dbName is None:
+        dbName = os.path.splitext(os.path.basename(source))[0]
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    length = KEY_LENGTHS[partitionBy]
+
+    sourceObj = sqlite3.connect(source)
+    dictionaries = textCompression.loadDictionaries(sourceObj)
+    keys = set(row[0] for row in sourceObj.execute('select distinct substr(date, 1, ?) from comments', [length]))
+    keys.update(row[0] for row in sourceObj.execute('select distinct substr(postDate, 1, ?) from submissions',
+                                                     [length]))
+
+    from reddit_dataset.redditDataset import createDateIndexes
+
+    paths = []
+    for key in sorted(keys):
+        path = partitionPath(directory, dbName, key)
+        dbObj = sqlite3.connect(path)
+        dbObj.execute('Create TABLE if not exists comments (date, user, body, comScore, postID)')
+        dbObj.execute('Create TABLE if not exists submissions (postID, postTitle, postBody, postScore, postDate, '
+                      'subredditName, subredditID)')
+        dbObj.executemany('Insert into comments VALUES (?, ?, ?, ?, ?)',
+                          sourceObj.execute('select * from comments where substr(date, 1, ?) = ?', [length, key]))
+        dbObj.executemany('Insert into submissions VALUES (?, ?, ?, ?, ?, ?, ?)',
+                          sourceObj.execute('select * from submissions where substr(postDate, 1, ?) = ?',
+                                            [length, key]))
+        for dictionary in dictionaries.values():
+            textCompression.saveDictionary(dbObj, dictionary)
+        createDateIndexes(dbObj)
+        dbObj.close()
+        paths.append(path)
+
+    sourceObj.close()
+    return paths
+
+
+def compactPartition(path, compressText=False):
+    """
+    Compacts a partition that will no longer be written to and makes its file read-only
+    :param path: path of the partition
+    :param compressText: also compress its comment and post bodies
+    """
+    if compressText:
+        from reddit_dataset.redditDataset import compressDB
+        compressDB(os.path.splitext(os.path.basename(path))[0], os.path.dirname(path))
+    else:
+        dbObj = sqlite3.connect(path)
+        dbObj.execute('vacuum')
+        dbObj.close()
+    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
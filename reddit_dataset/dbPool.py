@@ -0,0 +1,105 @@
+import os
+import queue
+import sqlite3
+import threading
+import contextlib
+from urllib.parse import quote
+
+
+class ReadPool:
+    """
+    Pool of tuned read-only connections to a reddit data set database. Statements are
+    kept prepared per connection, so range queries repeated through the pool are not
+    re-parsed.
+    """
+
+    def __init__(self, dbPath, size=4, cacheSize=-65536, mmapSize=268435456, tempStore='memory',
+                 cachedStatements=128):
+        """
+        :param dbPath: path to the database
+        :param size: maximum number of open connections
+        :param cacheSize: page cache of each connection, in pages or in KiB if negative
+        :param mmapSize: number of bytes of the database to memory map
+        :param tempStore: where temporary tables are kept: 'default', 'file' or 'memory'
+        :param cachedStatements: number of prepared statements kept per connection
+        """
+        if tempStore.lower() not in ['default', 'file', 'memory']:
+            raise ValueError('tempStore must be default, file or memory')
+        self.__dbPath = os.path.abspath(dbPath)
+        self.__size = size
+        self.__pragmas = ['PRAGMA cache_size = {:d}'.format(cacheSize),
+                          'PRAGMA mmap_size = {:d}'.format(mmapSize),
+                          'PRAGMA temp_store = {}'.format(tempStore.lower())]
+        self.__cachedStatements = cachedStatements
+        self.__lock = threading.Lock()
+        self.__reset()
+
+    def __reset(self):
+        self.__pid = os.getpid()
+        self.__idle = queue.LifoQueue()
+        self.__opened = 0
+
+    def __connect(self):
+        connection = sqlite3.connect('file:{}?mode=ro'.format(quote(self.__dbPath)), uri=True,
+                                     check_same_thread=False, cached_statements=self.__cachedStatements)
+        for pragma in self.__pragmas:
+            connection.execute(pragma)
+        return connection
+
+    def acquire(self):
+        """
+        :return: an idle connection, opening a new one if fewer than size are open
+        """
+        with self.__lock:
+            # connections must not be shared with a forked process, so start over in the child
+            if self.__pid != os.getpid():
+                self.__reset()
+            try:
+                return self.__idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self.__opened < self.__size:
+                self.__opened += 1
+                openNew = True
+            else:
+                openNew = False
+            idle = self.__idle
+        if openNew:
+            return self.__connect()
+        return idle.get()
+
+    def release(self, connection):
+        """
+        :param connection: connection returned by acquire
+        :return: void
+        """
+        if self.__pid == os.getpid():
+            self.__idle.put(connection)
+        else:
+            connection.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """ Context manager lending a connection from the pool """
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+
+__pools = dict()
+__poolsLock = threading.Lock()
+
+
+def getPool(dbPath, **settings):
+    """
+    :param dbPath: path to the database
+    :param settings: keyword arguments of ReadPool, used when the pool is first created
+    :return: the shared ReadPool of the database
+    """
+    key = os.path.abspath(dbPath)
+    with __poolsLock:
+        if key not in __pools:
+            __pools[key] = ReadPool(dbPath, **settings)
+        return __pools[key]
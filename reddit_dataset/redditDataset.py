@@ -10,12 +10,21 @@ import os
 import sqlite3
 import re
 import shutil
+from urllib.parse import quote
+from reddit_dataset import dbPool
+from reddit_dataset import textCompression
+from reddit_dataset import dbPartitions
+from reddit_dataset import responseCache
+
+# number of bodies stored plain before a compressed database without a dictionary trains one
+DICTIONARY_TRAINING_TEXTS = 2000
 
 
 
 def createDataset(r, subreddits, startDate=(datetime.datetime.now()-datetime.timedelta(days=7)).strftime('%y%m%d%H%M%S'),
                   endDate=datetime.datetime.now().strftime('%y%m%d%H%M%S'), nCommentsPerSubmission=100, dbName='reddit',
-                  dbPath=None, fineScale=12, nPostsPerFineScale=200, keywords=[]):
+                  dbPath=None, fineScale=12, nPostsPerFineScale=200, keywords=[], compressText=False,
+                  partitionBy=None, cache=None):
     """
     :param r: reddit object
     :param subreddits: list of subreddits to grab
@@ -25,20 +34,32 @@ def createDataset(r, subreddits, startDate=(datetime.datetime.now()-datetime.tim
     :param dbName: base of database name
     :param fineScale: scale of database in hours
     :param nPostsPerFineScale: number of posts per fine scale
+    :param compressText: store comment and post bodies compressed
+    :param partitionBy: 'year', 'month' or 'day' to write one database file per time partition into a
+                        directory called dbName, or None for a single database file
+    :param cache: responseCache.ResponseCache to serve API responses from, or None
     :return:
     """
 
     # initialize database
-    dbObj = RedditDB(dbName=dbName, dbPath=dbPath)
+    if partitionBy is not None:
+        dbObj = dbPartitions.PartitionedRedditDB(dbName=dbName, dbPath=dbPath, partitionBy=partitionBy,
+                                                 compressText=compressText)
+    else:
+        dbObj = RedditDB(dbName=dbName, dbPath=dbPath, compressText=compressText)
 
     # loop through each subreddit
     for sub in subreddits:
 
-        print('Processing subreddit: ', str(sub.title.encode('utf-8'))[2:-1])
+        # the title of a subreddit is only known to the API, so name it instead when replaying offline
+        if cache is not None and cache.offline:
+            print('Processing subreddit: ', sub.display_name)
+        else:
+            print('Processing subreddit: ', str(sub.title.encode('utf-8'))[2:-1])
 
         # get submissions within the date range
         matchingPosts = getAllPostsWithinRangeFineScale(sub, startDate=startDate, endDate=endDate, fineScale=fineScale,
-                                                        nPostsPer=nPostsPerFineScale)
+                                                        nPostsPer=nPostsPerFineScale, cache=cache)
 
         # loop through each post and get top comments
         for post in matchingPosts:
@@ -64,7 +85,7 @@ def createDataset(r, subreddits, startDate=(datetime.datetime.now()-datetime.tim
                 gotComments = False
                 while not gotComments and numTries < 10:
                     try:
-                        comments = getCommentsFromSubmission(post, nCommentsPerSubmission)
+                        comments = getCommentsFromSubmission(post, nCommentsPerSubmission, cache=cache, r=r)
                         gotComments = True
                     except HTTPError:
                         time.sleep(2)
@@ -72,7 +93,8 @@ def createDataset(r, subreddits, startDate=(datetime.datetime.now()-datetime.tim
 
                 # save comment data for comments which have not been deleted if the comment matches any of the given keywords
                 for comment in comments:
-                    if isinstance(comment, praw.objects.Comment) and comment.author is not None:
+                    if isinstance(comment, (praw.objects.Comment, responseCache.CachedComment)) and \
+                            comment.author is not None:
                         if keywords != None:
                             for keyword in keywords:
                                 if keyword in comment.body:
@@ -109,7 +131,29 @@ def getRecentSubmissions(subreddit, dateRange):
     return searchResult
 
 
-def getCommentsFromSubmission(submission, nCommentsPerSubmission):
+def getCommentsFromSubmission(submission, nCommentsPerSubmission, cache=None, r=None):
+    """
+    :param submission: submission object
+    :param nCommentsPerSubmission: number of comments to grab
+    :param cache: responseCache.ResponseCache to serve the response from, or None
+    :param r: reddit object, needed to request the comments of a submission replayed from the cache
+    :return: list of comments
+    """
+
+    if cache is not None:
+        def fetchItems():
+            liveSubmission = submission
+            if isinstance(submission, responseCache.CachedSubmission):
+                liveSubmission = r.get_submission(submission_id=submission.name.split('_')[-1])
+            return [responseCache.serializeComment(comment) for comment in
+                    getCommentsFromSubmission(liveSubmission, nCommentsPerSubmission)
+                    if isinstance(comment, praw.objects.Comment)]
+
+        # comments on older posts stop changing, so the age of the post decides if the response expires
+        params = {'submission': submission.name, 'nComments': nCommentsPerSubmission}
+        items = cache.fetch('getCommentsFromSubmission', params, fetchItems,
+                            windowEnd=datetime.datetime.fromtimestamp(submission.created_utc))
+        return [responseCache.deserializeComment(item) for item in items]
 
     # get comment list
     flatComments = praw.helpers.flatten_tree(submission.comments)
@@ -118,7 +162,7 @@ def getCommentsFromSubmission(submission, nCommentsPerSubmission):
     return flatComments[:nCommentsPerSubmission]
 
 
-def getAllPostsWithinRangeFineScale(subreddit, startDate, endDate, fineScale=12, nPostsPer=1000):
+def getAllPostsWithinRangeFineScale(subreddit, startDate, endDate, fineScale=12, nPostsPer=1000, cache=None):
     """
     Grabs posts using fine scale to grab maximum number
     :param fineScale: scale in hours. Default is 12.
@@ -126,6 +170,7 @@ def getAllPostsWithinRangeFineScale(subreddit, startDate, endDate, fineScale=12,
     :param startDate: start date in format yymmdd
     :param endDate: end date in format yymmdd
     :param nPostsPer: number of posts per unit
+    :param cache: responseCache.ResponseCache to serve API responses from, or None
     :return:
     """
 
@@ -155,7 +200,7 @@ def getAllPostsWithinRangeFineScale(subreddit, startDate, endDate, fineScale=12,
         tempEndStr = tempEnd.strftime('%y%m%d%H%M%S')
 
         # get posts within range
-        tempPosts = getPostsWithinRange(subreddit, tempStartStr, tempEndStr, nPosts=nPostsPer)
+        tempPosts = getPostsWithinRange(subreddit, tempStartStr, tempEndStr, nPosts=nPostsPer, cache=cache)
 
         # combine with posts
         posts = itertools.chain(posts, tempPosts)
@@ -167,13 +212,23 @@ def getAllPostsWithinRangeFineScale(subreddit, startDate, endDate, fineScale=12,
     return posts
 
 
-def getPostsWithinRange(subreddit, startDate, endDate, nPosts=1000):
+def getPostsWithinRange(subreddit, startDate, endDate, nPosts=1000, cache=None):
     """
     :param subreddit: subreddit object
     :param startDate: start date in format yymmddHHMMSS
     :param endDate: end date in format yymmddHHMMSS
+    :param cache: responseCache.ResponseCache to serve the response from, or None
     :return: generator object of posts
     """
+    if cache is not None:
+        params = {'subreddit': subreddit.display_name.lower(), 'startDate': startDate, 'endDate': endDate,
+                  'nPosts': nPosts}
+        fetchItems = lambda: [responseCache.serializeSubmission(post) for post in
+                              getPostsWithinRange(subreddit, startDate, endDate, nPosts=nPosts)]
+        items = cache.fetch('getPostsWithinRange', params, fetchItems,
+                            windowEnd=datetime.datetime.strptime(endDate, "%y%m%d%H%M%S"))
+        return [responseCache.deserializeSubmission(item) for item in items]
+
     # convert dates to unix time format
     startDate = time.mktime(datetime.datetime.strptime(startDate, "%y%m%d%H%M%S").timetuple())
     endDate = time.mktime(datetime.datetime.strptime(endDate, "%y%m%d%H%M%S").timetuple())
@@ -202,11 +257,29 @@ class RedditDB:
     Class for interfacing with a database for reddit data sets
     """
 
-    def __init__(self, dbName='reddit', dbPath=None):
+    def __init__(self, dbName='reddit', dbPath=None, compressText=False, dictionary=None, **poolSettings):
+        """
+        :param dbName: base of database name
+        :param dbPath: directory of the database
+        :param compressText: store comment and post bodies compressed with the database's latest
+                             preset dictionary. Without one, the first DICTIONARY_TRAINING_TEXTS bodies
+                             are stored plain and a dictionary is trained on them and compresses them.
+        :param dictionary: preset dictionary bytes to compress with, e.g. one shared with other
+                           databases, instead of the database's latest dictionary
+        :param poolSettings: keyword arguments of dbPool.ReadPool used for reads
+        """
         self.__dbName = dbName
         self.__dbPath = dbPath
+        self.__compressText = compressText
+        self.__poolSettings = poolSettings
         self.__c = None  # initialized in initialize database
         self.__initializeDatabase()
+        if dictionary:
+            textCompression.saveDictionary(self.__dbObj, dictionary)
+            self.__dictionary = dictionary
+        else:
+            self.__dictionary = textCompression.latestDictionary(self.__dbObj)
+        self.__plainTexts = 0
 
     def __getDatabasePath(self):
         """
@@ -226,6 +299,12 @@ class RedditDB:
             os.makedirs(basePath)
         return databasePath
 
+    def getDatabasePath(self):
+        """
+        :return: full absolute database path
+        """
+        return self.__getDatabasePath()
+
     def __initializeDatabase(self):
         """
         Initializes a database connection called 'reddit.db'
@@ -244,6 +323,7 @@ class RedditDB:
 
         if not commentsPresent:
             self.__createTables()
+        createDateIndexes(self.__dbObj)
 
     def __createTables(self):
         # create comments table
@@ -253,6 +333,39 @@ class RedditDB:
         self.__c.execute('Create TABLE submissions (postID, postTitle, postBody, postScore, postDate, '
                          'subredditName, subredditID)')
 
+    def __storeText(self, text):
+        """
+        :param text: comment or post body
+        :return: the value to store for the text
+        """
+        if text is None or not self.__compressText:
+            return text
+        # deflate without a dictionary saves little and makes short texts bigger, so wait for one
+        if not self.__dictionary:
+            self.__plainTexts += 1
+            return text
+        return textCompression.compressText(text, self.__dictionary)
+
+    def __trainWhenReady(self, force=False):
+        """
+        Trains a dictionary on the bodies stored plain so far and compresses them once there are enough
+        :param force: train on however many bodies have been stored
+        :return: void
+        """
+        if not self.__compressText or self.__dictionary or self.__plainTexts == 0:
+            return
+        if force or self.__plainTexts >= DICTIONARY_TRAINING_TEXTS:
+            self.trainCompressionDictionary()
+            if self.__dictionary:
+                self.compressExistingText()
+            self.__plainTexts = 0
+
+    def getDictionary(self):
+        """
+        :return: the preset dictionary text is compressed with, or None
+        """
+        return self.__dictionary or None
+
     def saveCommentData(self, comment):
         """
         :param comment: comment object
@@ -263,13 +376,14 @@ class RedditDB:
         commentDate = datetime.datetime.fromtimestamp(comment.created_utc)
         commentDateStr = commentDate.strftime('%Y%m%d%H%M%S')
         userName = comment.author.name
-        body = comment.body
+        body = self.__storeText(comment.body)
         submissionID = comment._submission.name
         score = comment.score
 
         # save data
         self.__c.execute('Insert into comments VALUES (?, ?, ?, ?, ?)', [int(commentDateStr), userName, body, score, submissionID])
         self.__c.connection.commit()
+        self.__trainWhenReady()
 
     def saveSubmission(self, post):
         """
@@ -286,50 +400,106 @@ class RedditDB:
         subredditName = post.subreddit.display_name
         score = post.score
         if post.is_self:
-            body = post.selftext
+            body = self.__storeText(post.selftext)
         else:
-            body = post.url
+            body = self.__storeText(post.url)
 
         # save data
         self.__c.execute('Insert into submissions VALUES (?, ?, ?, ?, ?, ?, ?)', [submissionID, submissionTitle, body,
                                                                                   score, int(submissionDateStr),
                                                                                   subredditName, subredditID])
         self.__c.connection.commit()
+        self.__trainWhenReady()
+
+    def __readPool(self):
+        """
+        :return: pool of read-only connections to the database, kept apart from the write cursor
+        """
+        return dbPool.getPool(self.__getDatabasePath(), **self.__poolSettings)
 
     def getSubreddits(self):
         """ Extracts a list of distinct subreddits """
 
-        # execute query
-        self.__c.execute('select distinct subredditName '
-                         'from submissions '
-                         'group by subredditName '
-                         'order by count(*) desc')
-
-        # grab results
-        rawOut = self.__c.fetchall()
+        # execute query and grab results
+        with self.__readPool().connection() as connection:
+            rawOut = connection.execute('select distinct subredditName '
+                                        'from submissions '
+                                        'group by subredditName '
+                                        'order by count(*) desc').fetchall()
 
         return [item[0] for item in rawOut]
 
     def getSubredditCommentText(self, subreddit):
         """ Grabs all comment text and concatenates from a given subreddit """
 
-        # execute query
-        self.__c.execute("select body "
-                         "from comments "
-                         "where postID in "
-                         "  (select postID "
-                         "   from submissions "
-                         "   where subredditName = ?)", [subreddit])
+        # execute query and get comments
+        with self.__readPool().connection() as connection:
+            rawComments = connection.execute("select body "
+                                             "from comments "
+                                             "where postID in "
+                                             "  (select postID "
+                                             "   from submissions "
+                                             "   where subredditName = ?)", [subreddit]).fetchall()
+            dictionaries = textCompression.loadDictionaries(connection)
 
-        # get comments
-        rawComments = self.__c.fetchall()
+        return [textCompression.decompressText(item[0], dictionaries) for item in rawComments]
 
-        return [item[0] for item in rawComments]
+    def trainCompressionDictionary(self, sampleSize=20000):
+        """
+        Trains a preset compression dictionary on a sample of the database's text and uses it for
+        text stored from now on
+        :param sampleSize: number of comments and of posts to sample
+        :return: size of the dictionary in bytes
+        """
+        dictionaries = textCompression.loadDictionaries(self.__dbObj)
+        rows = self.__c.execute('select body from comments order by random() limit ?', [sampleSize]).fetchall()
+        rows += self.__c.execute('select postBody from submissions order by random() limit ?', [sampleSize]).fetchall()
+        texts = [textCompression.decompressText(row[0], dictionaries) for row in rows if row[0] is not None]
+
+        self.__dictionary = textCompression.trainDictionary(texts)
+        if self.__dictionary:
+            textCompression.saveDictionary(self.__dbObj, self.__dictionary)
+        return len(self.__dictionary)
+
+    def compressExistingText(self):
+        """
+        Rewrites every comment and post body compressed with the latest dictionary
+        :return: tuple of (bytes of text before compression, bytes after compression)
+        """
+        dictionaries = textCompression.loadDictionaries(self.__dbObj)
+        plainBytes = 0
+        compressedBytes = 0
+        for table, column in [('comments', 'body'), ('submissions', 'postBody')]:
+            rows = self.__c.execute('select rowid, {} from {}'.format(column, table)).fetchall()
+            for rowid, value in rows:
+                if value is None:
+                    continue
+                text = textCompression.decompressText(value, dictionaries)
+                compressed = textCompression.compressText(text, self.__dictionary)
+                plainBytes += len(text.encode('utf-8'))
+                compressedBytes += len(compressed)
+                self.__c.execute('update {} set {} = ? where rowid = ?'.format(table, column), [compressed, rowid])
+        self.__dbObj.commit()
+        self.__c.execute('vacuum')
+        return plainBytes, compressedBytes
 
     def closeConnection(self):
+        # compress the bodies of a database too small to have reached DICTIONARY_TRAINING_TEXTS
+        self.__trainWhenReady(force=True)
         self.__dbObj.close()
 
 
+def createDateIndexes(connection):
+    """
+    Indexes the dates of comments and submissions so that date ranges are found without a full scan
+    :param connection: writable database connection
+    :return: void
+    """
+    connection.execute('Create INDEX if not exists commentsDate on comments (date)')
+    connection.execute('Create INDEX if not exists submissionsDate on submissions (postDate)')
+    connection.commit()
+
+
 def mergeDBs(path, dbName='mergedDB'):
     """
     Merges multiple databases into one large database
@@ -370,11 +540,60 @@ def mergeDBs(path, dbName='mergedDB'):
         # create query
         sqlQuery = "attach '" + os.path.abspath(os.path.join(path, dbFile)) + """' as toMerge;
                     INSERT into comments select * from toMerge.comments;
-                    INSERT into submissions select * from toMerge.submissions;
-                    detach toMerge;"""
+                    INSERT into submissions select * from toMerge.submissions;"""
 
         # execute and commit
         c.executescript(sqlQuery)
+
+        # carry over the dictionaries of any compressed text
+        hasDictionaries = c.execute("select name from toMerge.sqlite_master where type = 'table' "
+                                    "and name = 'textDictionaries'").fetchall()
+        if hasDictionaries:
+            textCompression.createDictionaryTable(dbObj)
+            c.execute('INSERT or ignore into textDictionaries select * from toMerge.textDictionaries')
         dbObj.commit()
+        c.execute('detach toMerge')
 
     print('Merge complete!')
+
+
+def timeRangeScan(databasePath):
+    """
+    Times a scan of every post in a database the way polldit reads it (utils.scan_posts), text
+    decompression and candidate matching included
+    :param databasePath: path of the database
+    :return: tuple of (number of posts matched, seconds taken)
+    """
+    # utils reads the polldit configuration, so only import it when a scan is timed
+    import utils
+
+    connection = sqlite3.connect('file:{}?mode=ro'.format(quote(databasePath)), uri=True)
+    startTime = time.time()
+    nPosts = sum(1 for post in utils.scan_posts(0, 99999999999999, connection=connection))
+    scanTime = time.time() - startTime
+    connection.close()
+    return nPosts, scanTime
+
+
+def compressDB(dbName, dbPath=None):
+    """
+    Trains a compression dictionary on a database, compresses all of its comment and post bodies
+    and reports the result
+    :param dbName: base of database name
+    :param dbPath: directory of the database
+    """
+    dbObj = RedditDB(dbName=dbName, dbPath=dbPath, compressText=True)
+    databasePath = dbObj.getDatabasePath()
+    sizeBefore = os.path.getsize(databasePath)
+    nPosts, scanTimeBefore = timeRangeScan(databasePath)
+
+    dictionarySize = dbObj.trainCompressionDictionary()
+    plainBytes, compressedBytes = dbObj.compressExistingText()
+    sizeAfter = os.path.getsize(databasePath)
+    dbObj.closeConnection()
+    nPosts, scanTimeAfter = timeRangeScan(databasePath)
+
+    print('Dictionary size: {} bytes'.format(dictionarySize))
+    print('Compression ratio: {:.2f}'.format(plainBytes / max(compressedBytes, 1)))
+    print('Database size: {} -> {} bytes'.format(sizeBefore, sizeAfter))
+    print('Date range scan: {} posts in {:.2f}s -> {:.2f}s'.format(nPosts, scanTimeBefore, scanTimeAfter))
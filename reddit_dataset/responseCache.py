@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import hashlib
+import datetime
+import types
+
+
+class CacheMissError(Exception):
+    """ Raised in offline mode when a request has no cached response """
+    pass
+
+
+class CachedSubmission(types.SimpleNamespace):
+    """ Submission replayed from the cache with the fields RedditDB and createDataset use """
+    pass
+
+
+class CachedComment(types.SimpleNamespace):
+    """ Comment replayed from the cache with the fields RedditDB and createDataset use """
+    pass
+
+
+def serializeSubmission(post):
+    """
+    :param post: praw submission object
+    :return: dictionary of the fields used from the submission
+    """
+    return {'name': post.name, 'title': post.title, 'created_utc': post.created_utc, 'score': post.score,
+            'is_self': post.is_self, 'selftext': post.selftext, 'url': post.url,
+            'subreddit': {'name': post.subreddit.name, 'display_name': post.subreddit.display_name}}
+
+
+def deserializeSubmission(fields):
+    """
+    :param fields: dictionary from serializeSubmission
+    :return: CachedSubmission object
+    """
+    fields = dict(fields)
+    fields['subreddit'] = types.SimpleNamespace(**fields['subreddit'])
+    return CachedSubmission(**fields)
+
+
+def serializeComment(comment):
+    """
+    :param comment: praw comment object
+    :return: dictionary of the fields used from the comment
+    """
+    return {'body': comment.body, 'created_utc': comment.created_utc, 'score': comment.score,
+            'author': comment.author.name if comment.author is not None else None,
+            'submission': comment._submission.name}
+
+
+def deserializeComment(fields):
+    """
+    :param fields: dictionary from serializeComment
+    :return: CachedComment object
+    """
+    author = types.SimpleNamespace(name=fields['author']) if fields['author'] is not None else None
+    return CachedComment(body=fields['body'], created_utc=fields['created_utc'], score=fields['score'],
+                         author=author, _submission=types.SimpleNamespace(name=fields['submission']))
+
+
+class ResponseCache:
+    """
+    On-disk cache of reddit API responses, addressed by a hash of the request parameters
+    """
+
+    def __init__(self, cachePath, ttl=3600, recentDays=7, offline=False):
+        """
+        :param cachePath: directory to store responses in
+        :param ttl: seconds a response for a recent window stays valid
+        :param recentDays: windows ending within this many days of now are recent; older windows never expire
+        :param offline: only replay cached responses and raise CacheMissError instead of requesting
+        """
+        self.cachePath = cachePath
+        self.ttl = ttl
+        self.recentDays = recentDays
+        self.offline = offline
+
+    def __entryPath(self, request, params):
+        key = hashlib.sha1(json.dumps([request, params], sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.cachePath, key[:2], key + '.json')
+
+    def __isFresh(self, entry, windowEnd):
+        if windowEnd is None:
+            return True
+        if datetime.datetime.now() - windowEnd > datetime.timedelta(days=self.recentDays):
+            return True
+        return time.time() - entry['created'] < self.ttl
+
+    def fetch(self, request, params, fetchItems, windowEnd=None):
+        """
+        :param request: name of the request
+        :param params: JSON-serializable request parameters
+        :param fetchItems: function performing the request and returning a list of JSON-serializable items
+        :param windowEnd: datetime the requested window ends at, or None if the response never changes
+        :return: list of items, from the cache when a fresh response is stored
+        """
+        path = self.__entryPath(request, params)
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            if self.offline or self.__isFresh(entry, windowEnd):
+                return entry['items']
+        if self.offline:
+            raise CacheMissError('no cached response for {} {}'.format(request, params))
+
+        items = fetchItems()
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        # write to a temporary file first so that an interrupted crawl never leaves a partial entry
+        tempPath = path + '.tmp'
+        with open(tempPath, 'w') as f:
+            json.dump({'created': time.time(), 'request': request, 'params': params, 'items': items}, f)
+        os.replace(tempPath, path)
+        return items
@@ -0,0 +1,132 @@
+import time
+import zlib
+import struct
+import collections
+
+# each compressed value starts with the crc32 of the preset dictionary it was compressed with
+HEADER = struct.Struct('>I')
+NO_DICTIONARY = 0
+
+DICTIONARY_SIZE = 32768
+
+
+def dictionaryID(dictionary):
+    """
+    :param dictionary: preset dictionary bytes
+    :return: integer id stored in front of every value compressed with the dictionary
+    """
+    if not dictionary:
+        return NO_DICTIONARY
+    return zlib.crc32(dictionary)
+
+
+def trainDictionary(texts, size=DICTIONARY_SIZE):
+    """
+    Builds a preset zlib dictionary out of the most common phrases in sample text
+    :param texts: iterable of sample strings
+    :param size: maximum size of the dictionary in bytes
+    :return: dictionary bytes
+    """
+
+    # count words and short phrases, weighted by the bytes they would save
+    counts = collections.Counter()
+    for text in texts:
+        words = text.split()
+        for n in range(1, 4):
+            for i in range(len(words) - n + 1):
+                counts[' '.join(words[i:i + n])] += 1
+
+    phrases = []
+    total = 0
+    for phrase, count in sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2:
+            break
+        encoded = phrase.encode('utf-8') + b' '
+        if total + len(encoded) > size:
+            continue
+        phrases.append(encoded)
+        total += len(encoded)
+
+    # zlib finds matches closer to the end of the dictionary more cheaply, so most common goes last
+    return b''.join(reversed(phrases))
+
+
+def compressText(text, dictionary=None):
+    """
+    :param text: string to compress
+    :param dictionary: preset dictionary bytes, or None
+    :return: compressed bytes
+    """
+    if dictionary:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return HEADER.pack(dictionaryID(dictionary)) + compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+
+def decompressText(value, dictionaries):
+    """
+    :param value: value read from a text column, either plain text or bytes from compressText
+    :param dictionaries: dictionary of dictionary ids mapped to dictionary bytes
+    :return: the text
+    """
+    if not isinstance(value, bytes):
+        return value
+    dictID, = HEADER.unpack_from(value)
+    if dictID == NO_DICTIONARY:
+        decompressor = zlib.decompressobj(-15)
+    else:
+        decompressor = zlib.decompressobj(-15, dictionaries[dictID])
+    return (decompressor.decompress(value[HEADER.size:]) + decompressor.flush()).decode('utf-8')
+
+
+def createDictionaryTable(connection):
+    """
+    :param connection: writable database connection
+    :return: void
+    """
+    connection.execute('Create TABLE if not exists textDictionaries (dictID INTEGER PRIMARY KEY, dictionary BLOB, '
+                       'created)')
+
+
+def saveDictionary(connection, dictionary):
+    """
+    :param connection: writable database connection
+    :param dictionary: dictionary bytes
+    :return: id of the dictionary
+    """
+    createDictionaryTable(connection)
+    dictID = dictionaryID(dictionary)
+    connection.execute('Insert or ignore into textDictionaries VALUES (?, ?, ?)', [dictID, dictionary, time.time()])
+    connection.commit()
+    return dictID
+
+
+def hasDictionaries(connection):
+    """
+    :param connection: database connection
+    :return: whether the database has a table of dictionaries
+    """
+    return len(connection.execute("Select name from sqlite_master where type = 'table' "
+                                  "and name = 'textDictionaries'").fetchall()) > 0
+
+
+def latestDictionary(connection):
+    """
+    :param connection: database connection
+    :return: the most recently saved dictionary, or None
+    """
+    if not hasDictionaries(connection):
+        return None
+    rows = connection.execute('Select dictionary from textDictionaries order by created desc limit 1').fetchall()
+    return rows[0][0] if rows else None
+
+
+def loadDictionaries(connection):
+    """
+    :param connection: database connection
+    :return: dictionary of dictionary ids mapped to dictionary bytes, empty if no text is compressed
+    """
+    if not hasDictionaries(connection):
+        return dict()
+    return dict(connection.execute('Select dictID, dictionary from textDictionaries').fetchall())
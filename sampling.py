@@ -0,0 +1,229 @@
+"""
+sampling.py
+
+Approximate candidate sentiment from a stratified random sample of posts.
+
+The time interval is split into buckets and every bucket of every table (and
+partition) is a stratum. The rowids of each stratum are read from the date
+index, and rows are drawn from the strata in rounds, in proportion to their
+sizes, until the confidence interval of every candidate's sentiment is within
+the requested tolerance or the time budget is spent. Only the drawn rows are
+read and classified. Which candidates a row mentions is only known once its
+text is read, so candidates are estimated from the drawn rows of every stratum
+with a ratio estimator: each candidate's share of the overall sentiment is
+its estimated sum of sentiment values over the estimated number of mentions,
+which is what polldit.relative_sentiments computes from an exact scan.
+"""
+import time
+import random
+import statistics
+import utils
+from configuration import *
+from reddit_dataset import textCompression
+from reddit_dataset import dbPartitions
+
+BUCKETS = 24
+TOLERANCE = 0.01
+TIME_BUDGET = 2.0
+BATCH_SIZE = 500
+CONFIDENCE = 0.95
+
+# rowids of the rows within a date range, found through the date index of each table
+ROWIDS_QUERIES = ["SELECT rowid FROM COMMENTS WHERE date >= ? AND date <= ?",
+                  "SELECT rowid FROM SUBMISSIONS WHERE postDate >= ? AND postDate <= ?"]
+ROWS_QUERIES = ["SELECT rowid, date, comScore, body, NULL FROM COMMENTS WHERE rowid IN ({})",
+                "SELECT rowid, postDate, postScore, postBody, postTitle FROM SUBMISSIONS WHERE rowid IN ({})"]
+# highest number of parameters of a query, below the SQLite limit
+MAX_PARAMETERS = 500
+
+
+class Stratum:
+    """
+    The rows of one table of one database file within one time bucket, and the rows drawn from it so far
+    """
+
+    def __init__(self, path, table, rowids):
+        self.path = path
+        self.table = table
+        self.rowids = rowids
+        self.drawn = 0
+        # running sums over the drawn rows of the number of mentions m and, per candidate, of the
+        # candidate's sentiment y, so that estimating never revisits the drawn rows
+        self.m = 0.0
+        self.mm = 0.0
+        self.y = dict()
+        self.yy = dict()
+        self.ym = dict()
+
+    def add(self, counts, value):
+        """
+        Add a drawn row mentioning each candidate the given number of times with the given sentiment value
+        """
+        mentions = sum(counts.values())
+        self.m += mentions
+        self.mm += mentions * mentions
+        for candidate in counts:
+            y = counts[candidate] * value
+            self.y[candidate] = self.y.get(candidate, 0.0) + y
+            self.yy[candidate] = self.yy.get(candidate, 0.0) + y * y
+            self.ym[candidate] = self.ym.get(candidate, 0.0) + y * mentions
+
+    def residual_variance(self, candidate, ratio):
+        """
+        Return the sample variance over the drawn rows of y - ratio * m for the given candidate
+        """
+        n = self.drawn
+        y, yy, ym = self.y.get(candidate, 0.0), self.yy.get(candidate, 0.0), self.ym.get(candidate, 0.0)
+        sum_squares = ((yy - y * y / n) - 2 * ratio * (ym - y * self.m / n)
+                       + ratio * ratio * (self.mm - self.m * self.m / n))
+        return max(sum_squares, 0.0) / (n - 1)
+
+    def draw(self, count, rng):
+        """
+        Return the rowids of the given number of rows not drawn before, chosen uniformly at random
+        """
+        # partial Fisher-Yates shuffle, so that drawing costs nothing for the rows left undrawn
+        count = min(count, len(self.rowids) - self.drawn)
+        for i in range(self.drawn, self.drawn + count):
+            j = rng.randrange(i, len(self.rowids))
+            self.rowids[i], self.rowids[j] = self.rowids[j], self.rowids[i]
+        drawn = self.rowids[self.drawn:self.drawn + count]
+        self.drawn += count
+        return drawn
+
+
+def date_strata(start_date, end_date, buckets=BUCKETS, database=DB):
+    """
+    Return the non-empty strata of the given time interval
+
+    :param start_date:  the integer start date of the time interval in YYYYMMDDHHMMSS format
+    :param end_date:    the integer end date of the time interval in YYYYMMDDHHMMSS format
+    :param buckets:     the number of time buckets to split the interval into
+    :param database:    the database file or directory of partitions to sample
+    """
+    if dbPartitions.isPartitioned(database):
+        paths = [path for key, path in dbPartitions.partitionsForRange(database, start_date, end_date)]
+    else:
+        paths = [database]
+
+    strata = []
+    for path in paths:
+        with utils.read_pool(path).connection() as connection:
+            for bucket_start, bucket_end in utils.split_date_range(start_date, end_date, buckets):
+                for table, query in enumerate(ROWIDS_QUERIES):
+                    rowids = [rowid for rowid, in connection.execute(query, (bucket_start, bucket_end))]
+                    if rowids:
+                        strata.append(Stratum(path, table, rowids))
+    return strata
+
+
+def read_rows(stratum, rowids):
+    """
+    Generate a tuple of (score, lowercase text, matched candidates) for the given rows of a stratum
+    """
+    with utils.read_pool(stratum.path).connection() as connection:
+        dictionaries = textCompression.loadDictionaries(connection)
+        for offset in range(0, len(rowids), MAX_PARAMETERS):
+            chunk = rowids[offset:offset + MAX_PARAMETERS]
+            query = ROWS_QUERIES[stratum.table].format(", ".join("?" * len(chunk)))
+            for rowid, date, score, body, title in connection.execute(query, chunk):
+                text = textCompression.decompressText(body, dictionaries)
+                if stratum.table == utils.SUBMISSIONS_TABLE:
+                    text = title + "\n" + text
+                text = text.lower()
+                yield score, text, utils.match_candidates(text)
+
+
+def estimate(strata, confidence=CONFIDENCE):
+    """
+    Estimate the sentiment of every candidate from the rows drawn from the strata so far
+
+    :return:    tuple: (dict of candidate -> estimated sum of sentiment values, estimated overall number
+                of mentions, dict of candidate -> half width of the confidence interval of the
+                candidate's sum over the overall number of mentions)
+    """
+    sums = dict()
+    overall_total = 0.0
+    for stratum in strata:
+        if stratum.drawn == 0:
+            continue
+        weight = len(stratum.rowids) / stratum.drawn
+        for candidate in stratum.y:
+            sums[candidate] = sums.get(candidate, 0.0) + weight * stratum.y[candidate]
+        overall_total += weight * stratum.m
+
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    errors = dict()
+    for candidate in sums:
+        # linearized ratio estimator: the variance of the candidate's residual from its share
+        ratio = sums[candidate] / max(overall_total, 1)
+        variance = 0.0
+        for stratum in strata:
+            n, size = stratum.drawn, len(stratum.rowids)
+            if n == size:
+                continue
+            if n < 2:
+                # the spread of a stratum is unknown until two of its rows are drawn
+                variance = float("inf")
+                break
+            variance += size * size * (1 - n / size) * stratum.residual_variance(candidate, ratio) / n
+        errors[candidate] = z * variance ** 0.5 / max(overall_total, 1)
+    return sums, overall_total, errors
+
+
+def approximate_sentiment(value_of, start_date, end_date, tolerance=TOLERANCE, time_budget=TIME_BUDGET,
+                          buckets=BUCKETS, batch_size=BATCH_SIZE, confidence=CONFIDENCE, seed=None,
+                          database=DB, report=None):
+    """
+    Estimate the sum of sentiment values of every candidate within a time interval from a
+    stratified random sample of its posts
+
+    :param value_of:    function of (lowercase text, score) returning the sentiment value of a post
+    :param start_date:  the integer start date of the time interval in YYYYMMDDHHMMSS format
+    :param end_date:    the integer end date of the time interval in YYYYMMDDHHMMSS format
+    :param tolerance:   stop once the confidence interval of every candidate's relative sentiment
+                        is at most this far from the estimate
+    :param time_budget: stop once this many seconds have been spent
+    :param buckets:     the number of time buckets to stratify the interval into
+    :param batch_size:  the number of rows drawn in each round
+    :param confidence:  the confidence level of the error bounds
+    :param seed:        optional seed for a reproducible sample
+    :param database:    the database file or directory of partitions to sample
+    :param report:      optional dictionary that is filled with the number of rows in the interval,
+                        the number of rows drawn and the seconds spent
+    :return:            tuple: (dict of candidate -> estimated sum of sentiment values, estimated
+                        overall number of mentions, dict of candidate -> error bound of the relative
+                        sentiment of the candidate)
+    """
+    start = time.time()
+    rng = random.Random(seed)
+    strata = date_strata(start_date, end_date, buckets, database)
+    population = sum(len(stratum.rowids) for stratum in strata)
+
+    # a post mentioning several candidates is seen once per candidate, so classify each text once
+    values = dict()
+    sums, overall_total, errors = dict(), 0, dict()
+    while True:
+        remaining = [stratum for stratum in strata if stratum.drawn < len(stratum.rowids)]
+        if not remaining:
+            break
+        # proportional allocation, with at least two rows per stratum so that its spread is known
+        for stratum in remaining:
+            count = max(2 - stratum.drawn, int(round(batch_size * len(stratum.rowids) / population)), 1)
+            for score, text, matches in read_rows(stratum, stratum.draw(count, rng)):
+                counts = dict()
+                for candidate in matches:
+                    counts[candidate] = counts.get(candidate, 0) + 1
+                if counts and (text, score) not in values:
+                    values[(text, score)] = value_of(text, score)
+                stratum.add(counts, values.get((text, score), 0))
+
+        sums, overall_total, errors = estimate(strata, confidence)
+        if time.time() - start >= time_budget or (errors and max(errors.values()) <= tolerance):
+            break
+
+    if report is not None:
+        report["rows"] = population
+        report["sampled"] = sum(stratum.drawn for stratum in strata)
+        report["seconds"] = time.time() - start
+    return sums, overall_total, errors
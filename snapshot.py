@@ -0,0 +1,173 @@
+"""
+snapshot.py
+
+Columnar snapshots of scored Reddit content so that repeated analysis runs can
+re-aggregate sentiment without going back through SQLite or re-classifying.
+
+A snapshot is a directory containing one NumPy array per column:
+
+    dates.npy           int64 date of each post in YYYYMMDDHHMMSS format
+    scores.npy          int64 Reddit score of each post
+    values.npy          float64 sentiment value assigned by polldit.classify
+    mentions.npy        uint8 matrix with a row per post and a column per candidate holding the
+                        number of the candidate's names matched in the post
+    text_offsets.npy    int64 offsets of each post's text within text.bin
+    text.bin            UTF-8 text of every post, concatenated
+    meta.json           candidate order of the mentions columns and the row count
+
+Every array is memory-mapped on load, so nothing is read from disk until a
+column is actually used. A post counts towards a candidate once for every name
+of theirs that matched, the same as in polldit.get_posts, so aggregating a
+snapshot gives the same sums and totals as scoring the posts from the database.
+"""
+import os
+import json
+import mmap
+import numpy as np
+from configuration import CANDIDATE_LIST
+
+
+COLUMNS = ["dates", "scores", "values", "mentions", "text_offsets"]
+
+
+def candidate_counts(candidates, candidate_order=CANDIDATE_LIST):
+    """
+    Return the number of times each candidate appears in the given list of matched candidates
+
+    :param candidates:      list of candidate names, with a candidate listed once per matched name
+    :param candidate_order: list of candidate names defining the column of each candidate
+    :return:                list of counts in the order of candidate_order
+    """
+    return [min(candidates.count(candidate), 255) for candidate in candidate_order]
+
+
+def write_snapshot(directory, rows):
+    """
+    Write a columnar snapshot of scored posts to the given directory
+
+    :param directory:   the directory to write the snapshot to, created if it does not exist
+    :param rows:        iterable of tuples: (date, score, value, candidates, text) where
+                        candidates is the list of candidates matched in the text as returned
+                        by utils.match_candidates
+    :return:            the number of rows written
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    dates, scores, values, counts, offsets = [], [], [], [], [0]
+    with open(os.path.join(directory, "text.bin"), "wb") as text_file:
+        for date, score, value, candidates, text in rows:
+            encoded = text.encode("utf-8")
+            text_file.write(encoded)
+            dates.append(date)
+            scores.append(score)
+            values.append(value)
+            counts.append(candidate_counts(list(candidates)))
+            offsets.append(offsets[-1] + len(encoded))
+
+    np.save(os.path.join(directory, "dates.npy"), np.array(dates, dtype=np.int64))
+    np.save(os.path.join(directory, "scores.npy"), np.array(scores, dtype=np.int64))
+    np.save(os.path.join(directory, "values.npy"), np.array(values, dtype=np.float64))
+    np.save(os.path.join(directory, "mentions.npy"),
+            np.array(counts, dtype=np.uint8).reshape(len(dates), len(CANDIDATE_LIST)))
+    np.save(os.path.join(directory, "text_offsets.npy"), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"candidates": CANDIDATE_LIST, "rows": len(dates)}, f)
+    return len(dates)
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped view of a snapshot written by write_snapshot
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.candidates = meta["candidates"]
+        self.rows = meta["rows"]
+        self.__columns = dict()
+        self.__text = None
+
+    def __getattr__(self, name):
+        # map each column lazily the first time it is accessed
+        if name in COLUMNS:
+            if name not in self.__columns:
+                path = os.path.join(self.directory, name + ".npy")
+                self.__columns[name] = np.load(path, mmap_mode="r")
+            return self.__columns[name]
+        raise AttributeError(name)
+
+    def text(self, index):
+        """
+        Return the text of the post at the given row index
+        """
+        if self.__text is None:
+            with open(os.path.join(self.directory, "text.bin"), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    self.__text = b""
+                else:
+                    self.__text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start, end = self.text_offsets[index], self.text_offsets[index + 1]
+        return self.__text[start:end].decode("utf-8")
+
+    def select(self, start_date=None, end_date=None):
+        """
+        Return a boolean mask of the rows within the given date range
+
+        :param start_date: the integer start date in YYYYMMDDHHMMSS format, or None for no lower bound
+        :param end_date: the integer end date in YYYYMMDDHHMMSS format, or None for no upper bound
+        """
+        mask = np.ones(self.rows, dtype=bool)
+        if start_date is not None:
+            mask &= self.dates >= start_date
+        if end_date is not None:
+            mask &= self.dates <= end_date
+        return mask
+
+    def candidate_counts(self, candidate, mask=None):
+        """
+        Return the number of times each row mentions the given candidate, as zero for the
+        rows not selected by mask
+        """
+        counts = self.mentions[:, self.candidates.index(candidate)]
+        if mask is not None:
+            counts = np.where(mask, counts, 0)
+        return counts
+
+    def candidate_rows(self, candidate, mask=None):
+        """
+        Return a boolean mask of the rows mentioning the given candidate, optionally
+        restricted to the rows already selected by mask
+        """
+        return self.candidate_counts(candidate, mask) != 0
+
+    def candidate_values(self, candidate, start_date=None, end_date=None):
+        """
+        Return the array of sentiment values of the posts mentioning the given candidate
+        within the given date range, with a value repeated for every name that matched
+        """
+        counts = self.candidate_counts(candidate, self.select(start_date, end_date))
+        return np.repeat(self.values, counts)
+
+    def aggregate(self, start_date=None, end_date=None, candidates=None):
+        """
+        Return the summed sentiment values and the number of mentions for each candidate
+        within the given date range
+
+        :param start_date:  the integer start date in YYYYMMDDHHMMSS format, or None
+        :param end_date:    the integer end date in YYYYMMDDHHMMSS format, or None
+        :param candidates:  list of candidates to aggregate, or None for all of them
+        :return:            tuple: (dict of candidate -> sum, dict of candidate -> count)
+        """
+        mask = self.select(start_date, end_date)
+        sums = dict()
+        totals = dict()
+        for candidate in (candidates if candidates is not None else self.candidates):
+            counts = self.candidate_counts(candidate, mask)
+            count = int(counts.sum())
+            if count > 0:
+                sums[candidate] = float(self.values.dot(counts))
+                totals[candidate] = count
+        return sums, totals
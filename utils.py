@@ -5,10 +5,31 @@ Nick Flanders
 Utility functions for use in polldit.py
 """
 import sys
+import re
 import math
 import datetime
 import collections
+import multiprocessing
+import features
 from configuration import *
+from reddit_dataset import dbPool
+from reddit_dataset import textCompression
+from reddit_dataset import dbPartitions
+
+# regular expressions for each candidate name that ensure that the name isn't part of another word
+NAME_PATTERNS = dict()
+for candidate in CANDIDATES:
+    NAME_PATTERNS[candidate] = [re.compile(r"^.* " + name) for name in CANDIDATES[candidate]]
+
+# tables scanned for posts, in the order they are scanned
+COMMENTS_TABLE = 0
+SUBMISSIONS_TABLE = 1
+
+# date range queries, kept identical so pooled connections reuse their prepared statements. The rows are
+# ordered explicitly since SQLite returns them in date order through a date index and in rowid order without one
+COMMENTS_RANGE_QUERY = "SELECT rowid, * FROM COMMENTS WHERE date >= ? AND date <= ? ORDER BY date, rowid"
+SUBMISSIONS_RANGE_QUERY = "SELECT rowid, * FROM SUBMISSIONS WHERE postDate >= ? AND postDate <= ? " \
+                          "ORDER BY postDate, rowid"
 
 def get_date(submission):
     """
@@ -42,6 +63,149 @@ def filter_by_candidate(post_list):
     return output
 
 
+def word_feats(words, filter_list=FILTER_SET, buckets=FEATURE_BUCKETS, min_length=3):
+    """
+    Return the feature dictionary of the given words for use with an NLTK classifier, using
+    the configured filter list and buckets unless others are given (see features.word_feats)
+    """
+    return features.word_feats(words, filter_list=filter_list, buckets=buckets, min_length=min_length)
+
+
+def match_candidates(text):
+    """
+    Return the candidates mentioned in the given lowercase text, with a candidate listed
+    once for every one of their names that matched
+
+    :param text: the lowercase text content to search for candidate names
+    """
+    matches = []
+    for candidate in CANDIDATES:
+        for pattern in NAME_PATTERNS[candidate]:
+            if pattern.match(text):
+                matches.append(candidate)
+    return matches
+
+
+def read_pool(database=DB):
+    """
+    Return the shared pool of read-only connections to the given database
+    """
+    return dbPool.getPool(database, **DB_POOL)
+
+
+def scan_posts(start_date, end_date, connection=None, database=DB):
+    """
+    Generate a tuple of (source, rowid, date, score, lowercase text, matched candidates) for
+    every comment and submission within the given time interval that mentions at least one
+    candidate, ordered by source, date and rowid. The source is a tuple of the
+    partition key (empty if the database is not partitioned) and the table of the row.
+
+    :param start_date:  the integer start date of the time interval in YYYYMMDDHHMMSS format
+    :param end_date:    the integer end date of the time interval in YYYYMMDDHHMMSS format
+    :param connection:  an open connection to the database to use instead of one from the pool
+    :param database:    the database file or directory of partitions to scan
+    """
+    if connection is not None:
+        for post in scan_connection(connection, start_date, end_date):
+            yield post
+    elif dbPartitions.isPartitioned(database):
+        # only open the partitions that can hold rows within the time interval
+        for key, path in dbPartitions.partitionsForRange(database, start_date, end_date):
+            with read_pool(path).connection() as connection:
+                for post in scan_connection(connection, start_date, end_date, key):
+                    yield post
+    else:
+        with read_pool(database).connection() as connection:
+            for post in scan_connection(connection, start_date, end_date):
+                yield post
+
+
+def scan_connection(connection, start_date, end_date, partition=""):
+    """
+    Generate the posts scan_posts finds within the time interval in a single database file
+
+    :param connection:  an open connection to the database file
+    :param start_date:  the integer start date of the time interval in YYYYMMDDHHMMSS format
+    :param end_date:    the integer end date of the time interval in YYYYMMDDHHMMSS format
+    :param partition:   the key of the partition the database file holds
+    """
+    db = connection.cursor()
+    dictionaries = textCompression.loadDictionaries(connection)
+
+    comments = db.execute(COMMENTS_RANGE_QUERY, (start_date, end_date))
+    for rowid, date, user, body, score, post_id in comments:
+        text = textCompression.decompressText(body, dictionaries).lower()
+        matches = match_candidates(text)
+        if matches:
+            yield (partition, COMMENTS_TABLE), rowid, date, score, text, matches
+
+    submissions = db.execute(SUBMISSIONS_RANGE_QUERY, (start_date, end_date))
+    for rowid, postID, title, body, score, date, subreddit_name, subreddit_id in submissions:
+        text = (title + "\n" + textCompression.decompressText(body, dictionaries)).lower()
+        matches = match_candidates(text)
+        if matches:
+            yield (partition, SUBMISSIONS_TABLE), rowid, date, score, text, matches
+
+
+def split_date_range(start_date, end_date, parts):
+    """
+    Split a time interval into contiguous, non-overlapping sub-intervals of equal length
+
+    :param start_date:  the integer start date of the time interval in YYYYMMDDHHMMSS format
+    :param end_date:    the integer end date of the time interval in YYYYMMDDHHMMSS format
+    :param parts:       the number of sub-intervals to split the time interval into
+    :return:            list of (start_date, end_date) tuples in YYYYMMDDHHMMSS format
+    """
+    date_format = "%Y%m%d%H%M%S"
+    try:
+        start = datetime.datetime.strptime(str(start_date), date_format)
+        end = datetime.datetime.strptime(str(end_date), date_format)
+    except ValueError:
+        # dates that are not real datetimes cannot be split evenly, so scan them as one interval
+        return [(start_date, end_date)]
+
+    step = (end - start) / parts
+    ranges = []
+    sub_start = start_date
+    for part in range(1, parts):
+        sub_end = (start + step * part).replace(microsecond=0)
+        sub_end_int = int(sub_end.strftime(date_format))
+        if sub_end_int >= sub_start and sub_end < end:
+            ranges.append((sub_start, sub_end_int))
+            sub_start = int((sub_end + datetime.timedelta(seconds=1)).strftime(date_format))
+    ranges.append((sub_start, end_date))
+    return ranges
+
+
+def scan_partition(date_range, database=DB):
+    """
+    Return the list of posts scan_posts finds within a single (start_date, end_date) tuple
+    using a read-only connection of the worker process's own pool
+    """
+    return list(scan_posts(date_range[0], date_range[1], database=database))
+
+
+def parallel_scan_posts(start_date, end_date, workers, database=DB):
+    """
+    Return the same posts as scan_posts, in the same order, by splitting the time interval
+    into sub-intervals that are scanned and matched by separate processes
+
+    :param start_date:  the integer start date of the time interval in YYYYMMDDHHMMSS format
+    :param end_date:    the integer end date of the time interval in YYYYMMDDHHMMSS format
+    :param workers:     the number of processes to scan with
+    :param database:    the database file or directory of partitions to scan
+    """
+    ranges = split_date_range(start_date, end_date, workers)
+    with multiprocessing.Pool(min(workers, len(ranges))) as pool:
+        partitions = pool.starmap(scan_partition, [(date_range, database) for date_range in ranges])
+
+    # restore the order of a serial scan: partition by partition, all comments then all submissions,
+    # each by date and rowid
+    scanned = [post for partition in partitions for post in partition]
+    scanned.sort(key=lambda post: (post[0], post[2], post[1]))
+    return scanned
+
+
 def safe_print(string):
     """
     If an error is found while printing due to an unsupported Unicode